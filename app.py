@@ -1,28 +1,291 @@
-from flask import Flask, request, jsonify, render_template
-import pickle
+import time
+_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, render_template, send_file
 import numpy as np
 import os
+import shutil
+import tempfile
+
+from audit import AuditLog
+from batcher import MicroBatcher
+from cache import PredictionCache
+from comparables import ComparablesIndex, parse_range
+from jobs import JobManager
+from inference import build_feature_matrix, extract_features, format_prediction, predict_records, sweep_matrix
+from metrics import Registry, RequestMetrics, StartupTimer, render_histogram
+import payloads
+from precomputed import PrecomputedResponse
+from registry import ModelRegistry
+
+startup = StartupTimer(_started)
+startup.mark('imports')
 
 app = Flask(__name__)
 
-# Load the model
-model_path = os.path.join(os.path.dirname(__file__), 'model.pkl')
-with open(model_path, 'rb') as f:
-    model = pickle.load(f)
+# Largest number of houses accepted by one /predict_batch request
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 10000))
+
+# Most houses returned by one /comparables request
+MAX_COMPARABLES = int(os.environ.get('MAX_COMPARABLES', 100))
+
+# Largest number of houses priced by one /sweep request (100 x 100 by default)
+MAX_SWEEP_POINTS = int(os.environ.get('MAX_SWEEP_POINTS', 10000))
+# Values per swept feature when the request does not set `steps`
+DEFAULT_SWEEP_STEPS = 50
+
+# Background bulk scoring jobs: worker processes (0 = all cores but one),
+# jobs running at once and jobs waiting for a slot
+JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(tempfile.gettempdir(), 'hpp-jobs'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 0))
+MAX_RUNNING_JOBS = int(os.environ.get('MAX_RUNNING_JOBS', 2))
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 8))
+# Seconds a stopping server process waits for its running jobs before failing them
+JOB_GRACEFUL_TIMEOUT = float(os.environ.get('JOB_GRACEFUL_TIMEOUT', 30))
+# Directory whose files jobs may read by path (unset = uploads only)
+JOB_INPUT_DIR = os.environ.get('JOB_INPUT_DIR')
+# Score jobs in float32, unless that moves any price by more than FLOAT32_TOLERANCE dollars
+FLOAT32_SCORING = os.environ.get('FLOAT32_SCORING', '0') != '0'
+FLOAT32_TOLERANCE = float(os.environ.get('FLOAT32_TOLERANCE', 100))
+
+# Micro-batching of concurrent /predict calls (0 ms window = off)
+MICRO_BATCH_WINDOW_MS = float(os.environ.get('MICRO_BATCH_WINDOW_MS', 0))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+
+# LRU cache of predicted prices (0 entries = off, 0 s TTL = never expire)
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 0))
+
+# Per-stage request instrumentation exposed at /metrics (0 = off)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# Audit log of every returned price, written in the background (unset directory = off)
+AUDIT_LOG_DIR = os.environ.get('AUDIT_LOG_DIR')
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_QUEUE_ROWS = int(os.environ.get('AUDIT_QUEUE_ROWS', 100000))
+AUDIT_MAX_FILE_MB = float(os.environ.get('AUDIT_MAX_FILE_MB', 64))
+AUDIT_KEEP_FILES = int(os.environ.get('AUDIT_KEEP_FILES', 50))
+
+# Hot reload of retrained models (0 s interval = only load at startup)
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 2))
+MODEL_KEEP_VERSIONS = int(os.environ.get('MODEL_KEEP_VERSIONS', 3))
+# Reject a new model whose smoke batch prices move by more than this many $100k (0 = no limit)
+MODEL_MAX_DEVIATION = float(os.environ.get('MODEL_MAX_DEVIATION', 0))
+# Send this share of traffic to a newly loaded model instead of promoting it
+MODEL_CANARY_PERCENT = float(os.environ.get('MODEL_CANARY_PERCENT', 0))
+# Also score every request with a newly loaded model and record the difference
+MODEL_SHADOW = os.environ.get('MODEL_SHADOW', '0') != '0'
+# Token required by POST /models/<version>/promote (unset = promotion disabled)
+MODEL_ADMIN_TOKEN = os.environ.get('MODEL_ADMIN_TOKEN')
 
-# Load feature names
+FEATURE_DESCRIPTIONS = {
+    'bedrooms': 'Number of bedrooms',
+    'bathrooms': 'Number of bathrooms',
+    'sqft_living': 'Square footage of living space',
+    'floors': 'Number of floors',
+    'waterfront': 'Has waterfront (0=No, 1=Yes)',
+    'view': 'View quality (0-4)',
+    'condition': 'Condition rating (1-5)',
+    'grade': 'Grade rating (4-12)',
+    'sqft_above': 'Square footage above ground',
+    'sqft_basement': 'Square footage of basement',
+    'yr_built': 'Year built',
+    'yr_renovated': 'Year renovated (0 if never)',
+    'lat': 'Latitude',
+    'long': 'Longitude',
+    'sqft_living15': 'Living area in 2015'
+}
+
+# Get min/max values from training data for ranges
+FEATURE_RANGES = {
+    'bedrooms': {'min': 0, 'max': 7, 'step': 1},
+    'bathrooms': {'min': 0, 'max': 5, 'step': 0.25},
+    'sqft_living': {'min': 300, 'max': 7000, 'step': 10},
+    'floors': {'min': 1, 'max': 3.5, 'step': 0.5},
+    'waterfront': {'min': 0, 'max': 1, 'step': 1},
+    'view': {'min': 0, 'max': 4, 'step': 1},
+    'condition': {'min': 1, 'max': 5, 'step': 1},
+    'grade': {'min': 4, 'max': 12, 'step': 1},
+    'sqft_above': {'min': 300, 'max': 7000, 'step': 10},
+    'sqft_basement': {'min': 0, 'max': 2500, 'step': 10},
+    'yr_built': {'min': 1900, 'max': 2025, 'step': 1},
+    'yr_renovated': {'min': 0, 'max': 2025, 'step': 1},
+    'lat': {'min': 47.0, 'max': 48.0, 'step': 0.0001},
+    'long': {'min': -123.0, 'max': -121.5, 'step': 0.0001},
+    'sqft_living15': {'min': 500, 'max': 5000, 'step': 10}
+}
+
+def range_smoke_batch(feature_names, n_rows=256, seed=0):
+    """Houses spread uniformly over FEATURE_RANGES, for checking new model versions"""
+    rng = np.random.default_rng(seed)
+    low = np.array([FEATURE_RANGES[f]['min'] for f in feature_names], dtype=np.float64)
+    high = np.array([FEATURE_RANGES[f]['max'] for f in feature_names], dtype=np.float64)
+    return rng.uniform(low, high, (n_rows, len(feature_names)))
+
+artifact_path = os.path.join(os.path.dirname(__file__), 'model.bin')
+model_path = os.path.join(os.path.dirname(__file__), 'model.pkl')
 features_path = os.path.join(os.path.dirname(__file__), 'features.pkl')
-with open(features_path, 'rb') as f:
-    feature_names = pickle.load(f)
+comparables_path = os.path.join(os.path.dirname(__file__), 'comparables.bin')
+
+# Set by init(); importing this module loads nothing, so the job workers that
+# spawn re-imports as __mp_main__ under `python app.py` start cheaply
+models = None
+feature_names = None
+batcher = None
+jobs = None
+comparables = None
+cache = None
+audit = None
+home_response = None
+features_response = None
+
+def init():
+    """Load the model and start the server components; python app.py, serve.py and asgi.py call this once"""
+    global models, feature_names, batcher, jobs, comparables, cache, audit, home_response, features_response
+    if models is not None:
+        return app
+
+    # Load the model and feature names, from model.bin when setup.py wrote one
+    models = ModelRegistry(artifact_path, model_path, features_path,
+                           keep=MODEL_KEEP_VERSIONS,
+                           poll_interval=MODEL_RELOAD_INTERVAL,
+                           max_deviation=MODEL_MAX_DEVIATION or None,
+                           canary_percent=MODEL_CANARY_PERCENT,
+                           shadow=MODEL_SHADOW)
+    # The input schema is fixed for the life of the process; reloads that change it are rejected
+    feature_names = models.active.feature_names
+    if set(feature_names) <= set(FEATURE_RANGES):
+        models.smoke_batch = range_smoke_batch(feature_names)
+    if MODEL_RELOAD_INTERVAL > 0:
+        models.start()
+    startup.mark('model load')
+
+    if MICRO_BATCH_WINDOW_MS > 0:
+        batcher = MicroBatcher(models.active.scorer, MICRO_BATCH_WINDOW_MS / 1000, MICRO_BATCH_MAX_SIZE)
+
+    # Bulk scoring runs in its own process pool, started on the first job
+    jobs = JobManager(JOBS_DIR, (artifact_path, model_path, features_path), workers=JOB_WORKERS or None,
+                      max_running=MAX_RUNNING_JOBS, max_queued=MAX_QUEUED_JOBS,
+                      float32_tolerance=FLOAT32_TOLERANCE if FLOAT32_SCORING else None)
+
+    # Spatial index of the training houses for /comparables, written by setup.py
+    if os.path.exists(comparables_path):
+        try:
+            comparables = ComparablesIndex.load(comparables_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Could not load comparables.bin ({e}), /comparables is disabled")
+
+    # Cache keys include the model version, so a reload never serves stale prices
+    if PREDICTION_CACHE_SIZE > 0:
+        cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL or None)
+
+    if AUDIT_LOG_DIR:
+        audit = AuditLog(AUDIT_LOG_DIR, feature_names, AUDIT_QUEUE_SIZE,
+                         max_file_bytes=int(AUDIT_MAX_FILE_MB * 1024 * 1024), keep_files=AUDIT_KEEP_FILES,
+                         max_rows=AUDIT_QUEUE_ROWS)
+
+    # The front page and feature metadata never change while the server runs, so
+    # they are rendered and compressed once
+    with app.app_context():
+        home_response = PrecomputedResponse(render_template('index.html'), 'text/html')
+        features_response = PrecomputedResponse(app.json.dumps({
+            'features': feature_names,
+            'descriptions': FEATURE_DESCRIPTIONS,
+            'ranges': FEATURE_RANGES
+        }), 'application/json')
+
+    startup.mark('app init')
+    if os.environ.get('STARTUP_TIMING'):
+        startup.report()
+    return app
+
+def shutdown():
+    """Finish or fail running jobs and write buffered audit entries; serve.py calls this before a worker exits"""
+    if jobs is not None:
+        jobs.shutdown(JOB_GRACEFUL_TIMEOUT)
+    if audit is not None:
+        audit.close()
+
+registry = Registry()
+request_metrics = RequestMetrics(registry, enabled=METRICS_ENABLED)
+
+def collect_component_metrics():
+    """Prometheus lines for the micro-batcher and prediction cache statistics"""
+    lines = []
+    if batcher is not None:
+        stats = batcher.stats()
+        lines += ['# HELP hpp_micro_batch_size Rows scored per micro-batch',
+                  '# TYPE hpp_micro_batch_size histogram']
+        lines += render_histogram('hpp_micro_batch_size', stats['batch_size'])
+        lines += ['# HELP hpp_micro_batch_queue_wait_seconds Time a row waited for its micro-batch',
+                  '# TYPE hpp_micro_batch_queue_wait_seconds histogram']
+        lines += render_histogram('hpp_micro_batch_queue_wait_seconds', stats['queue_wait_seconds'])
+    if cache is not None:
+        stats = cache.stats()
+        for name in ('hits', 'misses', 'evictions'):
+            lines += [f'# HELP hpp_prediction_cache_{name}_total Prediction cache {name}',
+                      f'# TYPE hpp_prediction_cache_{name}_total counter',
+                      f'hpp_prediction_cache_{name}_total {stats[name]}']
+        lines += ['# HELP hpp_prediction_cache_entries Prices held in the prediction cache',
+                  '# TYPE hpp_prediction_cache_entries gauge',
+                  f'hpp_prediction_cache_entries {stats["size"]}']
+    if audit is not None:
+        stats = audit.stats()
+        for name in ('written', 'dropped'):
+            lines += [f'# HELP hpp_audit_{name}_total Audit log entries {name}',
+                      f'# TYPE hpp_audit_{name}_total counter',
+                      f'hpp_audit_{name}_total {stats[name]}']
+        lines += ['# HELP hpp_audit_queue_entries Audit log entries waiting to be written',
+                  '# TYPE hpp_audit_queue_entries gauge',
+                  f'hpp_audit_queue_entries {stats["queued"]}']
+    return lines
+
+registry.add_collector(collect_component_metrics)
+
+@app.before_request
+def check_model_pin():
+    """Refuse a request pinned to a model version that is not resident, instead of serving another"""
+    requested = request.headers.get('X-Model-Version')
+    if requested and models.get(requested) is None:
+        return jsonify({'error': f'Model version {requested} is not loaded'}), 409
+
+def choose_model():
+    """Return the model version that serves this request, honouring an X-Model-Version pin"""
+    return models.choose(request.headers.get('X-Model-Version'))
+
+def with_model_version(response, model):
+    response.headers['X-Model-Version'] = model.version
+    return response
+
+def predict_one(model, features):
+    """Return the price of one house, through the cache and micro-batcher when enabled"""
+    if cache is not None:
+        key = (model.version, PredictionCache.make_key(features))
+        prediction = cache.get(key)
+        if prediction is not None:
+            return prediction
+    
+    if batcher is not None:
+        prediction = batcher.predict(features, model.scorer)
+    else:
+        features_array = np.array(features).reshape(1, -1)
+        prediction = model.scorer.predict(features_array)[0]
+    
+    if cache is not None:
+        cache.put(key, prediction)
+    return prediction
 
 @app.route('/')
 def home():
-    return render_template('index.html')
+    return home_response.respond(request)
 
 @app.route('/predict', methods=['POST'])
-def predict():
+@request_metrics.track('predict')
+def predict(timer):
+    start = time.perf_counter()
     try:
         data = request.get_json()
+        timer.mark('decode')
         
         # Extract features in the correct order
         features = []
@@ -30,65 +293,389 @@ def predict():
             if feature in data:
                 features.append(float(data[feature]))
             else:
+                timer.error('missing_feature')
                 return jsonify({'error': f'Missing feature: {feature}'}), 400
+        timer.mark('extract')
         
         # Make prediction
-        features_array = np.array(features).reshape(1, -1)
-        prediction = model.predict(features_array)[0]
+        model = choose_model()
+        prediction = predict_one(model, features)
+        timer.mark('inference')
+        if audit is not None:
+            audit.record('predict', model.version, time.perf_counter() - start, features, prediction)
         
-        return jsonify({
-            'predicted_price': round(prediction, 2),
-            'predicted_price_formatted': f'${prediction * 100000:,.0f}'
-        })
+        result = format_prediction(prediction)
+        result['model_version'] = model.version
+        response = with_model_version(jsonify(result), model)
+        timer.mark('serialize')
+        return response
     
     except Exception as e:
+        timer.error(type(e).__name__)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/features', methods=['GET'])
-def get_features():
-    """Return the list of required features and their descriptions"""
-    feature_descriptions = {
-        'bedrooms': 'Number of bedrooms',
-        'bathrooms': 'Number of bathrooms',
-        'sqft_living': 'Square footage of living space',
-        'floors': 'Number of floors',
-        'waterfront': 'Has waterfront (0=No, 1=Yes)',
-        'view': 'View quality (0-4)',
-        'condition': 'Condition rating (1-5)',
-        'grade': 'Grade rating (4-12)',
-        'sqft_above': 'Square footage above ground',
-        'sqft_basement': 'Square footage of basement',
-        'yr_built': 'Year built',
-        'yr_renovated': 'Year renovated (0 if never)',
-        'lat': 'Latitude',
-        'long': 'Longitude',
-        'sqft_living15': 'Living area in 2015'
-    }
+@app.route('/predict_batch', methods=['POST'])
+@request_metrics.track('predict_batch')
+def predict_batch(timer):
+    """Score a JSON array of houses with one vectorized model call
+
+    Also accepts the binary matrix and columnar JSON formats from payloads.py,
+    selected by Content-Type, and answers in the same format.
+    """
+    start = time.perf_counter()
+    try:
+        if request.mimetype in payloads.CONTENT_TYPES:
+            return predict_bulk_payload(timer, start)
+        
+        records = request.get_json()
+        timer.mark('decode')
+        if not isinstance(records, list):
+            timer.error('not_a_list')
+            return jsonify({'error': 'Expected a JSON array of houses'}), 400
+        if len(records) > MAX_BATCH_SIZE:
+            timer.error('batch_too_large')
+            return jsonify({'error': f'Batch too large: {len(records)} houses (max {MAX_BATCH_SIZE})'}), 413
+        
+        model = choose_model()
+        results = predict_records(model.scorer, records, feature_names)
+        timer.mark('inference')
+        if audit is not None:
+            audit.record('predict_batch', model.version, time.perf_counter() - start, records, results)
+        
+        response = with_model_version(jsonify({
+            'predictions': results,
+            'count': len(results),
+            'errors': sum('error' in r for r in results),
+            'model_version': model.version
+        }), model)
+        timer.mark('serialize')
+        return response
+    
+    except Exception as e:
+        timer.error(type(e).__name__)
+        return jsonify({'error': str(e)}), 500
+
+def predict_bulk_payload(timer, start):
+    """Score a binary matrix or columnar JSON body without per-house dicts"""
+    try:
+        matrix, dtype = payloads.decode(request.mimetype, request.get_data(), feature_names)
+    except payloads.PayloadError as e:
+        timer.error('bad_payload')
+        return jsonify({'error': str(e)}), 400
+    timer.mark('decode')
+    if len(matrix) > MAX_BATCH_SIZE:
+        timer.error('batch_too_large')
+        return jsonify({'error': f'Batch too large: {len(matrix)} houses (max {MAX_BATCH_SIZE})'}), 413
+    
+    model = choose_model()
+    prices = model.scorer.predict(matrix)
+    timer.mark('inference')
+    if audit is not None:
+        audit.record('predict_batch', model.version, time.perf_counter() - start, matrix, prices)
+    
+    response = with_model_version(
+        Response(payloads.encode(request.mimetype, prices, dtype), mimetype=request.mimetype), model)
+    timer.mark('serialize')
+    return response
+
+def explainable_model():
+    """Return the model version for this request, or None if it cannot explain prices"""
+    model = choose_model()
+    return model if hasattr(model.predictor, 'explain') else None
+
+@app.route('/importance', methods=['GET'])
+def get_importance():
+    """Return the global feature importances of the serving model, largest first"""
+    model = explainable_model()
+    if model is None:
+        return jsonify({'error': 'The serving model does not support explanations'}), 501
+    importances = sorted(zip(feature_names, model.predictor.importances.tolist()), key=lambda x: -x[1])
+    return with_model_version(jsonify({
+        'importances': [{'feature': f, 'importance': round(v, 4)} for f, v in importances],
+        'model_version': model.version
+    }), model)
+
+@app.route('/explain', methods=['POST'])
+@request_metrics.track('explain')
+def explain(timer):
+    """Return each feature's price contribution for one house or a batch
+
+    Accepts the same bodies as /predict_batch (or a single JSON house). For
+    every house, `baseline` plus the contributions is its predicted price.
+    """
+    model = explainable_model()
+    if model is None:
+        timer.error('not_explainable')
+        return jsonify({'error': 'The serving model does not support explanations'}), 501
+    predictor = model.predictor
+    
+    try:
+        if request.mimetype in payloads.CONTENT_TYPES:
+            matrix, dtype = payloads.decode(request.mimetype, request.get_data(), feature_names)
+            rows, errors = None, {}
+        else:
+            records = request.get_json()
+            if isinstance(records, dict):
+                records = [records]
+            if not isinstance(records, list):
+                timer.error('not_a_list')
+                return jsonify({'error': 'Expected a JSON house or array of houses'}), 400
+            matrix, rows, errors = build_feature_matrix(records, feature_names)
+    except payloads.PayloadError as e:
+        timer.error('bad_payload')
+        return jsonify({'error': str(e)}), 400
+    timer.mark('decode')
+    n_houses = len(matrix) + len(errors)
+    if n_houses > MAX_BATCH_SIZE:
+        timer.error('batch_too_large')
+        return jsonify({'error': f'Batch too large: {n_houses} houses (max {MAX_BATCH_SIZE})'}), 413
+    
+    # One matrix operation for the whole batch
+    contributions = predictor.explain(matrix)
+    prices = contributions.sum(axis=1) + predictor.intercept
+    timer.mark('inference')
+    
+    if rows is None:
+        body = payloads.encode_table(request.mimetype, np.column_stack([contributions, prices]),
+                                     feature_names + ['predicted_price'], dtype)
+        response = Response(body, mimetype=request.mimetype)
+    else:
+        results = [None] * n_houses
+        for i, message in errors.items():
+            results[i] = {'error': message}
+        for i, price, row in zip(rows, prices.tolist(), np.round(contributions, 4).tolist()):
+            results[i] = dict(format_prediction(price), contributions=row)
+        response = jsonify({
+            'features': feature_names,
+            'baseline': round(predictor.intercept, 4),
+            'explanations': results,
+            'count': len(results),
+            'errors': len(errors),
+            'model_version': model.version
+        })
+    timer.mark('serialize')
+    return with_model_version(response, model)
+
+def sweep_axis(spec):
+    """Return (column, values) for one swept feature, defaulting to its FEATURE_RANGES entry"""
+    if not isinstance(spec, dict) or spec.get('feature') not in feature_names:
+        raise ValueError('Each entry of "vary" needs a known "feature" (and optional min, max, steps)')
+    feature = spec['feature']
+    defaults = FEATURE_RANGES.get(feature, {})
+    low = float(spec.get('min', defaults.get('min', 0)))
+    high = float(spec.get('max', defaults.get('max', 0)))
+    if not np.isfinite(high - low):
+        raise ValueError(f'Sweep of {feature} needs finite min and max')
+    if 'steps' in spec:
+        steps = int(spec['steps'])
+    elif 'step' in defaults:
+        steps = min(int(round((high - low) / defaults['step'])) + 1, DEFAULT_SWEEP_STEPS)
+    else:
+        steps = DEFAULT_SWEEP_STEPS
+    if steps < 1 or high < low:
+        raise ValueError(f'Sweep of {feature} needs steps >= 1 and min <= max')
+    # Checked before the values are allocated; the route checks the product of both axes
+    if steps > MAX_SWEEP_POINTS:
+        raise ValueError(f'Sweep of {feature} has too many steps: {steps} (max {MAX_SWEEP_POINTS})')
+    return feature_names.index(feature), np.linspace(low, high, steps)
+
+@app.route('/sweep', methods=['POST'])
+@request_metrics.track('sweep')
+def sweep(timer):
+    """Price a base house over a 1-D or 2-D grid of one or two features
+
+    Body: {"house": {...}, "vary": [{"feature": "sqft_living", "min": 1000, "max": 4000, "steps": 100}, ...]}.
+    min, max and steps are optional and default to the ranges from /features;
+    prices[i][j] is the price at the i-th value of the first feature and the
+    j-th value of the second.
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict) or not isinstance(data.get('house'), dict):
+            raise ValueError('Expected a JSON object with "house" and "vary"')
+        vary = data.get('vary')
+        if not isinstance(vary, list) or not 1 <= len(vary) <= 2:
+            raise ValueError('"vary" must list one or two features')
+        base = extract_features(data['house'], feature_names)
+        axes = [sweep_axis(spec) for spec in vary]
+        if len({column for column, _ in axes}) != len(axes):
+            raise ValueError('"vary" lists the same feature twice')
+    except KeyError as e:
+        timer.error('missing_feature')
+        return jsonify({'error': f'Missing feature: {e.args[0]}'}), 400
+    except (TypeError, ValueError, OverflowError) as e:
+        timer.error('bad_sweep')
+        return jsonify({'error': str(e)}), 400
+    n_points = int(np.prod([len(values) for _, values in axes]))
+    if n_points > MAX_SWEEP_POINTS:
+        timer.error('sweep_too_large')
+        return jsonify({'error': f'Sweep too large: {n_points} houses (max {MAX_SWEEP_POINTS})'}), 413
+    timer.mark('decode')
     
-    # Get min/max values from training data for ranges
-    ranges = {
-        'bedrooms': {'min': 0, 'max': 7, 'step': 1},
-        'bathrooms': {'min': 0, 'max': 5, 'step': 0.25},
-        'sqft_living': {'min': 300, 'max': 7000, 'step': 10},
-        'floors': {'min': 1, 'max': 3.5, 'step': 0.5},
-        'waterfront': {'min': 0, 'max': 1, 'step': 1},
-        'view': {'min': 0, 'max': 4, 'step': 1},
-        'condition': {'min': 1, 'max': 5, 'step': 1},
-        'grade': {'min': 4, 'max': 12, 'step': 1},
-        'sqft_above': {'min': 300, 'max': 7000, 'step': 10},
-        'sqft_basement': {'min': 0, 'max': 2500, 'step': 10},
-        'yr_built': {'min': 1900, 'max': 2025, 'step': 1},
-        'yr_renovated': {'min': 0, 'max': 2025, 'step': 1},
-        'lat': {'min': 47.0, 'max': 48.0, 'step': 0.0001},
-        'long': {'min': -123.0, 'max': -121.5, 'step': 0.0001},
-        'sqft_living15': {'min': 500, 'max': 5000, 'step': 10}
-    }
+    # The whole curve or grid is priced in one vectorized call
+    model = choose_model()
+    prices = model.scorer.predict(sweep_matrix(base, axes))
+    timer.mark('inference')
     
+    response = with_model_version(jsonify({
+        'axes': [{'feature': feature_names[column], 'values': values.tolist()} for column, values in axes],
+        'prices': np.round(prices, 2).reshape([len(values) for _, values in axes]).tolist(),
+        'model_version': model.version
+    }), model)
+    timer.mark('serialize')
+    return response
+
+@app.route('/comparables', methods=['GET'])
+@request_metrics.track('comparables')
+def get_comparables(timer):
+    """Return the k nearest sold houses to a point, optionally filtered by feature ranges
+
+    Query parameters: lat, long, k (default 10), radius_km (default 2) and
+    any column as a filter, e.g. bedrooms=3 or sqft_living=1500:2500.
+    """
+    if comparables is None:
+        timer.error('no_index')
+        return jsonify({'error': 'No comparables index loaded; run setup.py to build comparables.bin'}), 503
+    try:
+        args = request.args
+        lat, long = float(args['lat']), float(args['long'])
+        k = int(args.get('k', 10))
+        radius_km = float(args.get('radius_km', 2.0))
+        if not 1 <= k <= MAX_COMPARABLES:
+            raise ValueError(f'k must be between 1 and {MAX_COMPARABLES}')
+        filters = {name: parse_range(value) for name, value in args.items()
+                   if name not in ('lat', 'long', 'k', 'radius_km')}
+        timer.mark('decode')
+        matches = comparables.query(lat, long, k, radius_km, filters)
+    except KeyError as e:
+        timer.error('missing_parameter')
+        return jsonify({'error': f'Missing parameter: {e.args[0]}'}), 400
+    except (ValueError, OverflowError) as e:
+        timer.error('bad_parameter')
+        return jsonify({'error': str(e)}), 400
+    timer.mark('search')
+    
+    response = jsonify({
+        'comparables': [comparables.describe(position, distance) for position, distance in matches],
+        'count': len(matches)
+    })
+    timer.mark('serialize')
+    return response
+
+def job_input_path(path):
+    """Resolve a client-supplied input path, which must lie inside JOB_INPUT_DIR"""
+    if not JOB_INPUT_DIR:
+        raise ValueError('Submitting a path is disabled; upload the file or set JOB_INPUT_DIR')
+    root = os.path.realpath(JOB_INPUT_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root or not os.path.isfile(resolved):
+        raise ValueError(f'No such file in JOB_INPUT_DIR: {path}')
+    return resolved
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a bulk scoring job for an uploaded file or a file in JOB_INPUT_DIR
+
+    Upload a CSV or JSONL file as the multipart field `file`, or send
+    {"path": "houses.csv"}. `format` (csv or jsonl) picks the output format.
+    Jobs use the active model version unless X-Model-Version pins another.
+    """
+    options = request.form if request.files else (request.get_json(silent=True) or {})
+    output_format = options.get('format', 'csv')
+    if output_format not in ('csv', 'jsonl'):
+        return jsonify({'error': 'format must be csv or jsonl'}), 400
+    requested = request.headers.get('X-Model-Version')
+    model = models.get(requested) if requested else models.active
+    if model is None:
+        return jsonify({'error': f'Model version {requested} is not loaded'}), 409
+    # Job workers load the model files, so only the version on disk can run a job
+    if model.version != models.disk_version:
+        return jsonify({'error': f'Jobs score with the model files on disk (version {models.disk_version}), '
+                                 f'not version {model.version}'}), 409
+    
+    job_id, job_dir = jobs.new_job_dir()
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            name = upload.filename or 'input.csv'
+            input_path = os.path.join(job_dir, 'input.jsonl' if name.lower().endswith(('.jsonl', '.ndjson')) else 'input.csv')
+            upload.save(input_path)
+        elif 'path' in options:
+            name = options['path']
+            input_path = job_input_path(name)
+        else:
+            raise ValueError('Upload a file as "file" or send {"path": ...}')
+        job = jobs.submit(job_id, input_path, model.version, feature_names, output_format, name)
+    except (ValueError, OverflowError) as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return jsonify({'error': str(e)}), 429 if isinstance(e, OverflowError) else 400
+    
+    response = with_model_version(jsonify(job.info()), model)
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List the jobs of every server worker"""
+    listed = jobs.list()
+    return jsonify({'jobs': [job.info() for job in listed], **jobs.stats(listed)})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return the status and progress of a job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.info())
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Download the predictions of a finished job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    if job.status != 'done':
+        return jsonify({'error': f'Job is {job.status}', 'job': job.info()}), 409
+    return send_file(job.output_path, as_attachment=True,
+                     download_name=f'predictions-{job.id}{os.path.splitext(job.output_path)[1]}')
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Return runtime statistics for tuning the serving path"""
     return jsonify({
-        'features': feature_names,
-        'descriptions': feature_descriptions,
-        'ranges': ranges
+        'micro_batching': batcher.stats() if batcher is not None else None,
+        'prediction_cache': cache.stats() if cache is not None else None,
+        'models': models.stats(),
+        'jobs': jobs.stats(),
+        'audit': audit.stats() if audit is not None else None
     })
 
+@app.route('/models', methods=['GET'])
+def get_models():
+    """Return the resident model versions and which one serves by default"""
+    return jsonify(models.stats())
+
+@app.route('/models/<version>/promote', methods=['POST'])
+def promote_model(version):
+    """Make a resident model version the default (requires X-Admin-Token)"""
+    if not MODEL_ADMIN_TOKEN or request.headers.get('X-Admin-Token') != MODEL_ADMIN_TOKEN:
+        return jsonify({'error': 'Promotion requires MODEL_ADMIN_TOKEN and a matching X-Admin-Token header'}), 403
+    if models.get(version) is None:
+        return jsonify({'error': f'Unknown model version: {version}'}), 404
+    models.promote(version)
+    return jsonify(models.stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose request and component metrics in the Prometheus text format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/features', methods=['GET'])
+def get_features():
+    """Return the list of required features and their descriptions"""
+    return features_response.respond(request)
+
 if __name__ == '__main__':
+    init()
     app.run(debug=True, host='0.0.0.0', port=5000)
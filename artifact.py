@@ -0,0 +1,139 @@
+"""
+Binary model artifact for House Price Predictor
+
+Layout (all integers little-endian):
+    8 bytes   magic b'HPPMODEL'
+    uint32    format version
+    uint32    header length in bytes
+    header    UTF-8 JSON with the feature order, metadata and array table
+    arrays    raw little-endian arrays, each starting on a 64-byte boundary
+
+The arrays are opened with np.memmap, so every worker process serving the same
+file shares one page-cache copy and loading it needs neither pickle nor sklearn.
+"""
+import json
+import os
+import pickle
+import struct
+
+import numpy as np
+
+from inference import CompiledPredictor, load_predictor
+
+MAGIC = b'HPPMODEL'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_artifact(path, arrays, feature_names, meta=None):
+    """Write named arrays plus the feature order to `path` atomically"""
+    arrays = {name: np.ascontiguousarray(a, dtype=np.asarray(a).dtype.newbyteorder('<'))
+              for name, a in arrays.items()}
+
+    # The header size depends on the offsets it lists, so lay out the arrays
+    # after a generously padded header and grow the padding if needed
+    reserve = ALIGNMENT
+    while True:
+        table = {}
+        offset = _align(_PREAMBLE.size + reserve)
+        for name, a in arrays.items():
+            table[name] = {'offset': offset, 'shape': list(a.shape), 'dtype': a.dtype.str}
+            offset = _align(offset + a.nbytes)
+        header = json.dumps({
+            'feature_names': list(feature_names),
+            'meta': meta or {},
+            'arrays': table
+        }).encode('utf-8')
+        if len(header) <= reserve:
+            break
+        reserve = _align(len(header))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, a in arrays.items():
+            f.seek(table[name]['offset'])
+            f.write(a.tobytes())
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+
+
+def load_artifact(path):
+    """Open an artifact and return (arrays, feature_names, meta)
+
+    The arrays are read-only np.memmap views of the file.
+    Raises ValueError if the file is not a supported artifact.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f'{path} is too short to be a model artifact')
+        magic, version, header_len = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a model artifact')
+        if version > FORMAT_VERSION:
+            raise ValueError(f'{path} uses artifact format {version}, newer than supported {FORMAT_VERSION}')
+        header = json.loads(f.read(header_len).decode('utf-8'))
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(spec['shape'])
+        if spec['offset'] + dtype.itemsize * int(np.prod(shape)) > size:
+            raise ValueError(f'{path} is truncated: array {name!r} runs past the end')
+        arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=spec['offset'], shape=shape)
+    return arrays, header['feature_names'], header['meta']
+
+
+def save_model_artifact(path, predictor, feature_names):
+    """Write a CompiledPredictor and its feature order to `path`"""
+    save_artifact(path, {
+        'coef': predictor.coef,
+        'intercept': np.array([predictor.intercept]),
+        'center': predictor.center,
+        'scale': predictor.scale
+    }, feature_names, meta={'model': 'standard_scaler+linear'})
+
+
+def load_model_artifact(path):
+    """Return (CompiledPredictor, feature_names) read from a model artifact"""
+    arrays, feature_names, meta = load_artifact(path)
+    missing = {'coef', 'intercept', 'center', 'scale'} - set(arrays)
+    if missing:
+        raise ValueError(f"{path} is missing arrays: {', '.join(sorted(missing))}")
+    if len(arrays['coef']) != len(feature_names):
+        raise ValueError(f'{path} has {len(arrays["coef"])} weights for {len(feature_names)} features')
+    predictor = CompiledPredictor(arrays['coef'], arrays['intercept'][0],
+                                  arrays['center'], arrays['scale'])
+    return predictor, feature_names
+
+
+def load_serving_model(artifact_path, model_path, features_path):
+    """Return (predictor, feature_names, source_path) for serving
+
+    The binary artifact is preferred; the pickles are the fallback when it is
+    missing, unreadable or older than model.pkl.
+    """
+    if os.path.exists(artifact_path):
+        stale = os.path.exists(model_path) and os.path.getmtime(model_path) > os.path.getmtime(artifact_path)
+        if stale:
+            print(f"⚠ {os.path.basename(artifact_path)} is older than {os.path.basename(model_path)}, loading the pickle")
+        else:
+            try:
+                predictor, feature_names = load_model_artifact(artifact_path)
+                return predictor, feature_names, artifact_path
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠ Could not load {os.path.basename(artifact_path)} ({e}), loading the pickle")
+
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    with open(features_path, 'rb') as f:
+        feature_names = pickle.load(f)
+    return load_predictor(model), feature_names, model_path
@@ -0,0 +1,170 @@
+"""
+ASGI variant of the prediction routes for House Price Predictor
+Run with any ASGI server, for example: uvicorn asgi:app --workers 4
+
+Request bodies are read with await, so a slow client uploading a large batch
+holds a coroutine instead of a worker thread. Scoring takes microseconds to
+milliseconds and runs inline on the event loop. Only /predict and
+/predict_batch are served here; the other routes stay in app.py.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+import app as flask_app
+import payloads
+from inference import extract_features, format_prediction, predict_records
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = int(os.environ.get('ASGI_MAX_BODY_BYTES', 32 * 1024 * 1024))
+
+flask_app.init()
+models = flask_app.models
+feature_names = flask_app.feature_names
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_body(receive):
+    """Return the request body, or None if the client disconnected"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, f'Request body larger than {MAX_BODY_BYTES} bytes')
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def respond(send, status, body, content_type='application/json', model=None):
+    if not isinstance(body, (bytes, str)):
+        body = json.dumps(body)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    headers = [(b'content-type', content_type.encode('latin-1')),
+               (b'content-length', str(len(body)).encode('latin-1'))]
+    if model is not None:
+        headers.append((b'x-model-version', model.version.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def parse_json(body):
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise HTTPError(400, f'Invalid JSON: {e}')
+
+
+def predict(body, model, start):
+    """Price one house, through the same prediction cache as app.py"""
+    data = parse_json(body)
+    if not isinstance(data, dict):
+        raise HTTPError(400, 'Expected a JSON object')
+    try:
+        features = extract_features(data, feature_names)
+    except KeyError as e:
+        raise HTTPError(400, f'Missing feature: {e.args[0]}')
+    except (TypeError, ValueError) as e:
+        raise HTTPError(400, str(e))
+
+    cache = flask_app.cache
+    key = (model.version, flask_app.PredictionCache.make_key(features))
+    prediction = cache.get(key) if cache is not None else None
+    if prediction is None:
+        prediction = model.scorer.predict(np.array(features).reshape(1, -1))[0]
+        if cache is not None:
+            cache.put(key, prediction)
+    if flask_app.audit is not None:
+        flask_app.audit.record('predict', model.version, time.perf_counter() - start, features, prediction)
+    result = format_prediction(prediction)
+    result['model_version'] = model.version
+    return result
+
+
+def predict_batch(body, content_type, model, start):
+    """Price a JSON array or binary/columnar batch of houses in one call"""
+    if content_type in payloads.CONTENT_TYPES:
+        try:
+            matrix, dtype = payloads.decode(content_type, body, feature_names)
+        except payloads.PayloadError as e:
+            raise HTTPError(400, str(e))
+        if len(matrix) > flask_app.MAX_BATCH_SIZE:
+            raise HTTPError(413, f'Batch too large: {len(matrix)} houses (max {flask_app.MAX_BATCH_SIZE})')
+        prices = model.scorer.predict(matrix)
+        if flask_app.audit is not None:
+            flask_app.audit.record('predict_batch', model.version, time.perf_counter() - start, matrix, prices)
+        return payloads.encode(content_type, prices, dtype), content_type
+
+    records = parse_json(body)
+    if not isinstance(records, list):
+        raise HTTPError(400, 'Expected a JSON array of houses')
+    if len(records) > flask_app.MAX_BATCH_SIZE:
+        raise HTTPError(413, f'Batch too large: {len(records)} houses (max {flask_app.MAX_BATCH_SIZE})')
+    results = predict_records(model.scorer, records, feature_names)
+    if flask_app.audit is not None:
+        flask_app.audit.record('predict_batch', model.version, time.perf_counter() - start, records, results)
+    return {
+        'predictions': results,
+        'count': len(results),
+        'errors': sum('error' in r for r in results),
+        'model_version': model.version
+    }, 'application/json'
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            flask_app.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'], scope['method']
+    if path not in ('/predict', '/predict_batch'):
+        return await respond(send, 404, {'error': 'Not found: the ASGI app serves /predict and /predict_batch'})
+    if method != 'POST':
+        return await respond(send, 405, {'error': 'Method not allowed'})
+
+    headers = dict(scope['headers'])
+    content_type = headers.get(b'content-type', b'').decode('latin-1').split(';')[0].strip()
+    requested = headers.get(b'x-model-version', b'').decode('latin-1') or None
+    try:
+        model = models.choose(requested)
+    except KeyError:
+        return await respond(send, 409, {'error': f'Model version {requested} is not loaded'})
+    try:
+        body = await read_body(receive)
+        if body is None:
+            return
+        start = time.perf_counter()
+        if path == '/predict':
+            result, result_type = predict(body, model, start), 'application/json'
+        else:
+            result, result_type = predict_batch(body, content_type, model, start)
+    except HTTPError as e:
+        return await respond(send, e.status, {'error': str(e)})
+    except Exception as e:
+        return await respond(send, 500, {'error': str(e)})
+    await respond(send, 200, result, result_type, model)
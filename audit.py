@@ -0,0 +1,190 @@
+"""
+Prediction audit log for House Price Predictor
+
+Request handlers only count the houses of a request under a short lock and
+append a tuple of references to an in-memory deque. A background thread drains the
+deque every `flush_interval` seconds, formats the entries as JSON lines and
+appends them to gzip files in the log directory. Each flush is one complete
+gzip member, so a file can be read while it is still being written and a
+crash loses at most one flush.
+
+The queue is bounded both in requests and in houses, since one batch request
+can hold thousands: when the writer falls behind, new entries are dropped
+and counted instead of growing memory. Files rotate at `max_file_bytes` and
+only the newest `keep_files` are kept. Every file starts with a header line
+naming the features, and file names include the process ID so pre-forked
+workers never share a file. replay.py reads these files back.
+"""
+import atexit
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+FILE_PATTERN = 'audit-*.jsonl.gz'
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0  # removed meanwhile
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None  # pruned by another worker
+
+
+def _rows(prices):
+    """Number of houses in one logged request"""
+    return 1 if np.isscalar(prices) else len(prices)
+
+
+class AuditLog:
+    """Bounded, non-blocking log of every price the service returns
+
+    `max_entries` bounds the queued requests and `max_rows` the houses they
+    hold; a request that would exceed either is dropped.
+    """
+
+    def __init__(self, directory, feature_names, max_entries=10000, flush_interval=1.0,
+                 max_file_bytes=64 * 1024 * 1024, keep_files=50, max_rows=100000):
+        self.directory = directory
+        self.feature_names = list(feature_names)
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.keep_files = keep_files
+        os.makedirs(directory, exist_ok=True)
+        self._start()
+        atexit.register(self.close)
+        # A forked worker writes its own files under its own PID
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        # Entries queued by a parent process are its to write, not the child's
+        self._queue = deque()
+        self._queued_rows = 0
+        self._count_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._path = None
+        self._sequence = 0
+        self.written = 0
+        self.dropped = 0
+        self.files = 0
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def record(self, endpoint, model_version, latency, features, prices):
+        """Queue one request for the log without blocking
+
+        `features` is one house in model order, a matrix of houses, or a list
+        of house records; `prices` is the price, an array of prices or the
+        list of per-record results. They are formatted by the writer thread.
+        """
+        rows = _rows(prices)
+        with self._count_lock:
+            if len(self._queue) >= self.max_entries or self._queued_rows + rows > self.max_rows:
+                self.dropped += 1
+                return
+            self._queued_rows += rows
+            self._queue.append((time.time(), endpoint, model_version, latency, features, prices))
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the writer and write everything still queued"""
+        self._closed.set()
+        self.flush()
+
+    def flush(self):
+        """Write every queued entry; returns the number written"""
+        with self._write_lock:
+            lines = []
+            while True:
+                try:
+                    entry = self._queue.popleft()
+                except IndexError:
+                    break
+                with self._count_lock:
+                    self._queued_rows -= _rows(entry[5])
+                lines.append(self._format(*entry))
+            if lines:
+                self._write(lines)
+            return len(lines)
+
+    def _format(self, ts, endpoint, model_version, latency, features, prices):
+        record = {'ts': round(ts, 6), 'endpoint': endpoint, 'model_version': model_version,
+                  'latency_ms': round(latency * 1000, 3)}
+        if isinstance(features, np.ndarray):
+            record['features'] = features.tolist()
+            record['prices'] = np.asarray(prices).tolist()
+        elif isinstance(prices, list):
+            # JSON batch: raw records and per-record results, missing values as null
+            record['features'] = [[r.get(name) for name in self.feature_names] if isinstance(r, dict) else None
+                                  for r in features]
+            record['prices'] = [r.get('predicted_price') for r in prices]
+        else:
+            record['features'] = list(features)
+            record['price'] = float(prices)
+        return json.dumps(record)
+
+    def _write(self, lines):
+        try:
+            size = _size(self._path) if self._path is not None else None
+            # Start a new file when the current one is full or was pruned by another worker
+            if size is None or size >= self.max_file_bytes:
+                self._rotate()
+            text = '\n'.join(lines) + '\n'
+            if not os.path.exists(self._path):
+                text = json.dumps({'feature_names': self.feature_names, 'pid': os.getpid()}) + '\n' + text
+            with gzip.open(self._path, 'ab') as f:
+                f.write(text.encode('utf-8'))
+            self.written += len(lines)
+        except OSError as e:
+            with self._count_lock:
+                self.dropped += len(lines)
+            if self.last_error is None:
+                print(f"⚠ Audit log write failed: {e}")
+            self.last_error = f'{type(e).__name__}: {e}'
+
+    def _rotate(self):
+        self._sequence += 1
+        name = f"audit-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence}.jsonl.gz"
+        self._path = os.path.join(self.directory, name)
+        self.files += 1
+        # Keep the newest files of every process sharing the directory
+        paths = sorted(glob.glob(os.path.join(self.directory, FILE_PATTERN)), key=_mtime)
+        for path in paths[:max(len(paths) - self.keep_files + 1, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'queued': len(self._queue),
+            'queued_rows': self._queued_rows,
+            'max_entries': self.max_entries,
+            'max_rows': self.max_rows,
+            'written': self.written,
+            'dropped': self.dropped,
+            'files': self.files,
+            'current_file': os.path.basename(self._path) if self._path else None,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,94 @@
+"""
+Micro-batching for concurrent /predict traffic
+Requests that arrive within a short window are scored with one vectorized call.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram
+
+# Bucket bounds for the batch size and queue wait (seconds) histograms
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+QUEUE_WAIT_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1]
+
+
+class MicroBatcher:
+    """Coalesce single-row predictions from many request threads
+
+    A background thread collects rows until `window` seconds have passed since
+    the first one arrived or `max_batch_size` rows are waiting, runs one
+    predictor.predict call and hands each caller its own price.
+    """
+
+    def __init__(self, predictor, window=0.002, max_batch_size=64):
+        self.predictor = predictor
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_waits = Histogram(QUEUE_WAIT_BUCKETS)
+        self._start()
+        # A forked worker gets a fresh queue: callers waiting in the parent are not its to answer
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def predict(self, features, predictor=None, timeout=None):
+        """Queue one house (a list of feature values) and wait for its price
+
+        Rows queued for different predictors (model versions) are scored in
+        separate calls within the same batch.
+        """
+        future = Future()
+        self._queue.put((time.perf_counter(), features, future, predictor or self.predictor))
+        return future.result(timeout)
+
+    def _collect(self):
+        """Block for the first queued row, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = batch[0][0] + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            groups = {}
+            for queued_at, row, future, predictor in batch:
+                self.queue_waits.observe(started - queued_at)
+                groups.setdefault(predictor, []).append((row, future))
+            self.batch_sizes.observe(len(batch))
+            for predictor, items in groups.items():
+                try:
+                    predictions = predictor.predict(np.array([row for row, _ in items]))
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), prediction in zip(items, predictions):
+                    future.set_result(prediction)
+
+    def stats(self):
+        """Return the batch size and queue wait histograms"""
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch_size': self.max_batch_size,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_seconds': self.queue_waits.snapshot()
+        }
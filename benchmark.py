@@ -0,0 +1,341 @@
+"""
+Benchmarks for House Price Predictor
+Measures raw model cost, /predict latency and cold start time.
+
+Run:      python benchmark.py run --out bench.json
+Compare:  python benchmark.py compare baseline.json bench.json
+
+Every result is a named metric where lower is better (seconds), so a compare
+run flags any metric that got slower than the baseline by more than the
+threshold and exits with status 1.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+BENCHES = ['predict', 'instrumentation', 'comparables', 'test_client', 'server', 'cold_start']
+
+# The default house from the web form
+SAMPLE_HOUSE = {
+    'bedrooms': 3, 'bathrooms': 2, 'sqft_living': 2000, 'floors': 1,
+    'waterfront': 0, 'view': 0, 'condition': 3, 'grade': 7,
+    'sqft_above': 1500, 'sqft_basement': 0, 'yr_built': 1980,
+    'yr_renovated': 0, 'lat': 47.56, 'long': -122.2, 'sqft_living15': 2000
+}
+
+
+def time_call(fn, min_time=0.2, max_repeats=10000):
+    """Return the median wall time of fn() in seconds over repeated calls"""
+    fn()  # warm up
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < max_repeats and (time.perf_counter() - start < min_time or len(timings) < 5):
+        t = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t)
+    return statistics.median(timings)
+
+
+def percentiles(latencies, prefix):
+    """Return p50/p90/p99 metrics for a list of latencies in seconds"""
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {f'{prefix}.p50': p50, f'{prefix}.p90': p90, f'{prefix}.p99': p99}
+
+
+def bench_predict(results):
+    """Raw predict cost of the serving predictor and of the sklearn pipeline"""
+    import pickle
+    import warnings
+    from artifact import load_serving_model
+    from inference import CompiledPredictor, Float32Predictor
+
+    predictor, feature_names, _ = load_serving_model(
+        os.path.join(BASE_DIR, 'model.bin'), os.path.join(BASE_DIR, 'model.pkl'),
+        os.path.join(BASE_DIR, 'features.pkl'))
+    with open(os.path.join(BASE_DIR, 'model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+
+    rng = np.random.default_rng(0)
+    row = np.array([float(SAMPLE_HOUSE[f]) for f in feature_names])
+    for n in BATCH_SIZES:
+        X = row * rng.uniform(0.8, 1.2, (n, len(row)))
+        results[f'predict.serving.batch_{n}'] = time_call(lambda: predictor.predict(X))
+        if isinstance(predictor, CompiledPredictor):
+            float32 = Float32Predictor(predictor, n)
+            X32 = np.asfortranarray(X, dtype=np.float32)  # the layout of buffer()
+            results[f'predict.float32.batch_{n}'] = time_call(lambda: float32.predict(X32))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            results[f'predict.sklearn.batch_{n}'] = time_call(lambda: model.predict(X))
+
+
+def bench_comparables(results, n_houses=1000000, n_queries=2000):
+    """Comparable-sales queries against a grid index over a million generated houses"""
+    from comparables import ComparablesIndex
+    from datagen import generate_houses
+
+    data = generate_houses(n_houses, seed=1)
+    start = time.perf_counter()
+    index = ComparablesIndex.build(data)
+    results['comparables.build_1m'] = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform([47.4, -122.4], [47.8, -122.0], (n_queries, 2))
+    filters = {'bedrooms': (3, 3), 'sqft_living': (1500, 2500)}
+    for name, kwargs in (('k10', {}), ('k10_filtered', {'filters': filters})):
+        latencies = []
+        for lat, long in points:
+            t = time.perf_counter()
+            index.query(lat, long, 10, 2.0, **kwargs)
+            latencies.append(time.perf_counter() - t)
+        results.update(percentiles(latencies, f'comparables.query_{name}'))
+
+
+def bench_test_client(results, n_requests):
+    """End-to-end /predict and /predict_batch latency through Flask's test client"""
+    sys.path.insert(0, BASE_DIR)
+    import app as app_module
+
+    app_module.init()
+    client = app_module.app.test_client()
+    latencies = []
+    for i in range(n_requests):
+        # Vary the house so the prediction cache does not answer everything
+        house = dict(SAMPLE_HOUSE, sqft_living=1000 + i)
+        t = time.perf_counter()
+        client.post('/predict', json=house)
+        latencies.append(time.perf_counter() - t)
+    results.update(percentiles(latencies, 'test_client.predict'))
+
+    batch = [dict(SAMPLE_HOUSE, sqft_living=1000 + i) for i in range(1000)]
+    results['test_client.predict_batch_1000'] = time_call(
+        lambda: client.post('/predict_batch', json=batch), max_repeats=50)
+
+
+def bench_instrumentation(results):
+    """Per-request cost of RequestMetrics with four stage marks, on and off"""
+    from flask import Response
+    from metrics import Registry, RequestMetrics
+
+    response = Response()
+    for enabled in (True, False):
+        request_metrics = RequestMetrics(Registry(), enabled=enabled)
+
+        @request_metrics.track('bench')
+        def view(timer):
+            timer.mark('decode')
+            timer.mark('extract')
+            timer.mark('inference')
+            timer.mark('serialize')
+            return response
+
+        name = 'on' if enabled else 'off'
+        results[f'instrumentation.{name}'] = time_call(view)
+    results['instrumentation.overhead'] = results['instrumentation.on'] - results['instrumentation.off']
+
+    # Folding buffered requests into the histograms happens off the request
+    # path, when /metrics is scraped
+    request_metrics.enabled = True
+    request_metrics.flush_every = float('inf')
+    request_metrics.flush()
+    for _ in range(10000):
+        view()
+    start = time.perf_counter()
+    request_metrics.flush()
+    results['instrumentation.flush_per_request'] = (time.perf_counter() - start) / 10000
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workers=1):
+    """Start app.py on the threaded Werkzeug server (or serve.py's workers) and wait until it answers"""
+    if workers > 1:
+        command = [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(workers)]
+    else:
+        command = [sys.executable, '-c', "import app; app.init(); from werkzeug.serving import run_simple; "
+                   f"run_simple('127.0.0.1', {port}, app.app, threaded=True)"]
+    proc = subprocess.Popen(command, cwd=BASE_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/features', timeout=1).read()
+            return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError('Server did not start within 30 seconds')
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def bench_server(results, url, n_requests, concurrency, workers=1, batch_size=100):
+    """/predict latency and throughput, and /predict_batch throughput, against a running server"""
+    def client(worker):
+        latencies = []
+        for i in range(worker, n_requests, concurrency):
+            house = dict(SAMPLE_HOUSE, sqft_living=1000 + i)
+            t = time.perf_counter()
+            post_json(url + '/predict', house)
+            latencies.append(time.perf_counter() - t)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [x for worker in pool.map(client, range(concurrency)) for x in worker]
+    elapsed = time.perf_counter() - start
+    server = f'server.w{workers}' if workers > 1 else 'server'
+    prefix = f'{server}.c{concurrency}.predict'
+    results.update(percentiles(latencies, prefix))
+    # Stored as seconds per request so that lower is better like every other metric
+    results[f'{prefix}.seconds_per_request'] = elapsed / len(latencies)
+
+    batch = [dict(SAMPLE_HOUSE, sqft_living=1000 + i) for i in range(batch_size)]
+    n_batches = max(n_requests // 10, concurrency)
+
+    def batch_client(worker):
+        for _ in range(worker, n_batches, concurrency):
+            post_json(url + '/predict_batch', batch)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(batch_client, range(concurrency)))
+    results[f'{server}.c{concurrency}.predict_batch{batch_size}.seconds_per_house'] = \
+        (time.perf_counter() - start) / (n_batches * batch_size)
+
+
+def bench_cold_start(results, repeats):
+    """Wall time from interpreter start until each entry point is loaded"""
+    for module, code in (('app', 'import app; app.init()'), ('standalone', 'import standalone')):
+        timings = []
+        for _ in range(repeats):
+            t = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - t)
+        results[f'cold_start.{module}'] = statistics.median(timings)
+
+
+def run(args):
+    results = {}
+    benches = set(args.only or BENCHES)
+    if 'predict' in benches:
+        print("Benchmarking raw predict...")
+        bench_predict(results)
+    if 'instrumentation' in benches:
+        print("Benchmarking request instrumentation...")
+        bench_instrumentation(results)
+    if 'comparables' in benches:
+        print("Benchmarking comparables queries...")
+        bench_comparables(results)
+    if 'test_client' in benches:
+        print("Benchmarking /predict through the test client...")
+        bench_test_client(results, args.requests)
+    if 'server' in benches:
+        print(f"Benchmarking a live server at concurrency {args.concurrency} with {args.workers} worker(s)...")
+        proc = None
+        url = args.url
+        if url is None:
+            port = free_port()
+            proc = start_server(port, args.workers)
+            url = f'http://127.0.0.1:{port}'
+        try:
+            bench_server(results, url.rstrip('/'), args.requests, args.concurrency, args.workers)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+    if 'cold_start' in benches:
+        print("Benchmarking cold start...")
+        bench_cold_start(results, args.repeats)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'results': results
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, value in sorted(results.items()):
+        print(f"  {name:<45} {value * 1e6:12.1f} us")
+    print(f"✓ Saved {args.out}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    for name in sorted(set(baseline) & set(current)):
+        ratio = current[name] / baseline[name] if baseline[name] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"  {name:<45} {baseline[name] * 1e6:12.1f} -> {current[name] * 1e6:12.1f} us  ({ratio:5.2f}x){flag}")
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f"  {name:<45} only in {'baseline' if name in baseline else 'current'}")
+
+    if regressions:
+        print(f"❌ {regressions} metric(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print("✓ No regressions")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the House Price Predictor')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='run the benchmarks and write a JSON report')
+    p.add_argument('--out', default='bench.json')
+    p.add_argument('--only', nargs='+', choices=BENCHES)
+    p.add_argument('--requests', type=int, default=2000, help='/predict requests per latency benchmark')
+    p.add_argument('--concurrency', type=int, default=8, help='concurrent clients for the live server')
+    p.add_argument('--workers', type=int, default=1,
+                   help='serve with serve.py and this many worker processes (default 1 = one threaded process)')
+    p.add_argument('--url', help='benchmark an already running server instead of starting app.py')
+    p.add_argument('--repeats', type=int, default=5, help='cold starts per entry point')
+    p.set_defaults(func=run)
+
+    p = sub.add_parser('compare', help='flag regressions against a baseline report')
+    p.add_argument('baseline')
+    p.add_argument('current')
+    p.add_argument('--threshold', type=float, default=0.10,
+                   help='allowed slowdown before a metric is flagged (default 0.10 = 10%%)')
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+In-process prediction cache for House Price Predictor
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Bounded LRU cache of predicted prices keyed on the ordered feature tuple
+
+    Entries older than `ttl` seconds are treated as misses.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(features):
+        """Return the canonical cache key for a list of feature values"""
+        return tuple(float(v) for v in features)
+
+    def get(self, key):
+        """Return the cached price for `key`, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl and now - entry[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, price):
+        with self._lock:
+            self._data[key] = (price, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Return the cache size and its hit, miss and eviction counters"""
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
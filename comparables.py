@@ -0,0 +1,202 @@
+"""
+Spatial index of sold houses for comparable-sales lookups
+
+Houses are bucketed into a regular lat/long grid and stored sorted by cell,
+row-major, with an offsets table. The cells covering a search circle then form
+one contiguous slice per grid row, so a query only reads the houses near the
+point. setup.py saves the index next to the model as comparables.bin (in the
+artifact format) and the server memory-maps it at startup.
+"""
+import math
+
+import numpy as np
+
+from artifact import load_artifact, save_artifact
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LONG = 111.320  # at the equator, scaled by cos(latitude)
+
+# Average number of houses per grid cell when the cell size is chosen automatically
+ROWS_PER_CELL = 32
+MAX_RADIUS_KM = 50.0
+
+
+def parse_range(text):
+    """Parse a filter value: '3' (exact), '1500:2500', '1500:' or ':2500'"""
+    try:
+        if ':' not in text:
+            value = float(text)
+            return value, value
+        low, high = text.split(':', 1)
+        return (float(low) if low else -np.inf), (float(high) if high else np.inf)
+    except ValueError:
+        raise ValueError(f'Invalid filter {text!r}: expected a number or low:high')
+
+
+class ComparablesIndex:
+    """Grid index over the houses in a training file
+
+    `values` holds every column (including price) as float32, in cell order;
+    `lat` and `long` are kept as float64 for exact distances and `rows` maps
+    back to row numbers in the training file.
+    """
+
+    def __init__(self, columns, values, lat, long, rows, offsets, lat0, long0, cell_deg, n_lat, n_long):
+        self.columns = list(columns)
+        self.values = values
+        self.lat = lat
+        self.long = long
+        self.rows = rows
+        self.offsets = offsets
+        self.lat0 = lat0
+        self.long0 = long0
+        self.cell_deg = cell_deg
+        self.n_lat = n_lat
+        self.n_long = n_long
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.lat)
+
+    @classmethod
+    def build(cls, data, columns=None, cell_deg=None):
+        """Build the index from a mapping of column arrays (a dict or DataFrame)
+
+        The mapping must include 'lat' and 'long'.
+        """
+        columns = list(data) if columns is None else list(columns)
+        lat = np.asarray(data['lat'], dtype=np.float64)
+        long = np.asarray(data['long'], dtype=np.float64)
+        n = len(lat)
+        if n == 0:
+            raise ValueError('Cannot build a comparables index from no houses')
+
+        lat0, long0 = float(lat.min()), float(long.min())
+        lat_extent, long_extent = float(lat.max()) - lat0, float(long.max()) - long0
+        if cell_deg is None:
+            # Square cells sized so that an average cell holds ROWS_PER_CELL houses
+            area = max(lat_extent, 1e-6) * max(long_extent, 1e-6)
+            cell_deg = min(max(math.sqrt(area * ROWS_PER_CELL / n), 1e-4), 1.0)
+        n_lat = int(lat_extent // cell_deg) + 1
+        n_long = int(long_extent // cell_deg) + 1
+
+        cells = ((lat - lat0) // cell_deg).astype(np.int64) * n_long + ((long - long0) // cell_deg).astype(np.int64)
+        order = np.argsort(cells, kind='stable')
+        offsets = np.searchsorted(cells[order], np.arange(n_lat * n_long + 1))
+        values = np.column_stack([np.asarray(data[c], dtype=np.float32)[order] for c in columns])
+        return cls(columns, values, lat[order], long[order], order.astype(np.int64), offsets,
+                   lat0, long0, cell_deg, n_lat, n_long)
+
+    def save(self, path):
+        save_artifact(path, {
+            'values': self.values,
+            'lat': self.lat,
+            'long': self.long,
+            'rows': self.rows,
+            'offsets': self.offsets
+        }, self.columns, meta={
+            'index': 'comparables_grid',
+            'lat0': self.lat0, 'long0': self.long0, 'cell_deg': self.cell_deg,
+            'n_lat': self.n_lat, 'n_long': self.n_long
+        })
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map an index written by save(); raises ValueError for other files"""
+        arrays, columns, meta = load_artifact(path)
+        if meta.get('index') != 'comparables_grid':
+            raise ValueError(f'{path} is not a comparables index')
+        # Plain ndarray views of the mapping index faster than np.memmap objects
+        arrays = {name: a.view(np.ndarray) for name, a in arrays.items()}
+        return cls(columns, arrays['values'], arrays['lat'], arrays['long'], arrays['rows'],
+                   arrays['offsets'], meta['lat0'], meta['long0'], meta['cell_deg'],
+                   meta['n_lat'], meta['n_long'])
+
+    def _candidates(self, lat, long, radius_km):
+        """Positions of the houses in the grid cells overlapping the search circle"""
+        d_lat = radius_km / KM_PER_DEGREE_LAT
+        d_long = radius_km / (KM_PER_DEGREE_LONG * max(math.cos(math.radians(lat)), 1e-6))
+        i_lo = math.floor((lat - d_lat - self.lat0) / self.cell_deg)
+        i_hi = math.floor((lat + d_lat - self.lat0) / self.cell_deg)
+        j_lo = math.floor((long - d_long - self.long0) / self.cell_deg)
+        j_hi = math.floor((long + d_long - self.long0) / self.cell_deg)
+        i_lo, i_hi = max(i_lo, 0), min(i_hi, self.n_lat - 1)
+        j_lo, j_hi = max(j_lo, 0), min(j_hi, self.n_long - 1)
+        if i_lo > i_hi or j_lo > j_hi:
+            return np.empty(0, dtype=np.int64)
+
+        # Cells j_lo..j_hi of one grid row are adjacent in storage
+        starts = self.offsets[np.arange(i_lo, i_hi + 1) * self.n_long + j_lo]
+        ends = self.offsets[np.arange(i_lo, i_hi + 1) * self.n_long + j_hi + 1]
+        return np.concatenate([np.arange(a, b) for a, b in zip(starts, ends)])
+
+    def _within(self, lat, long, radius_km, filters):
+        """Positions and distances of the matching houses within radius_km"""
+        positions = self._candidates(lat, long, radius_km)
+        dy = (self.lat[positions] - lat) * KM_PER_DEGREE_LAT
+        dx = (self.long[positions] - long) * (KM_PER_DEGREE_LONG * math.cos(math.radians(lat)))
+        distance = np.hypot(dx, dy)
+        inside = distance <= radius_km
+        positions, distance = positions[inside], distance[inside]
+        if filters:
+            rows = self.values[positions]
+            mask = np.ones(len(positions), dtype=bool)
+            for name, (low, high) in filters.items():
+                column = rows[:, self._column_index[name]]
+                mask &= (column >= low) & (column <= high)
+            positions, distance = positions[mask], distance[mask]
+        return positions, distance
+
+    def query(self, lat, long, k=10, radius_km=2.0, filters=None):
+        """Return up to k (position, distance_km) pairs nearest to (lat, long)
+
+        Only houses within radius_km and inside every filter range
+        ({column: (low, high)}, inclusive) are considered.
+        """
+        # Comparisons are False for NaN, so it is rejected too
+        if not (-90 <= lat <= 90 and -180 <= long <= 180):
+            raise ValueError('lat must be in [-90, 90] and long in [-180, 180]')
+        if not 0 < radius_km <= MAX_RADIUS_KM:
+            raise ValueError(f'radius_km must be in (0, {MAX_RADIUS_KM:g}]')
+        for name in filters or {}:
+            if name not in self._column_index:
+                raise ValueError(f'Unknown filter: {name}')
+
+        # Search a growing circle: once it holds k matches, nothing outside it
+        # can be nearer, so dense areas never scan the whole radius
+        search_km = min(self.cell_deg * KM_PER_DEGREE_LAT, radius_km)
+        while True:
+            positions, distance = self._within(lat, long, search_km, filters)
+            if len(distance) >= k or search_km >= radius_km:
+                break
+            search_km = min(search_km * 2, radius_km)
+
+        if len(distance) > k:
+            nearest = np.argpartition(distance, k - 1)[:k]
+            positions, distance = positions[nearest], distance[nearest]
+        order = np.argsort(distance, kind='stable')
+        return list(zip(positions[order].tolist(), distance[order].tolist()))
+
+    def describe(self, position, distance_km):
+        """Return one comparable house as a JSON-ready dict"""
+        house = {name: round(float(v), 2) for name, v in zip(self.columns, self.values[position])}
+        house['lat'] = float(self.lat[position])
+        house['long'] = float(self.long[position])
+        house['row'] = int(self.rows[position])
+        house['distance_km'] = round(distance_km, 3)
+        return house
+
+
+def build_from_csv(path, chunk_size=100000, columns=None):
+    """Build the index from a CSV read in chunks, keeping only float32 columns in memory"""
+    import pandas as pd
+
+    parts = {}
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        if columns is None:
+            columns = list(chunk.columns)
+        for name in columns:
+            # lat/long stay float64 for exact distances
+            dtype = np.float64 if name in ('lat', 'long') else np.float32
+            parts.setdefault(name, []).append(chunk[name].to_numpy(dtype=dtype))
+    return ComparablesIndex.build({name: np.concatenate(arrays) for name, arrays in parts.items()}, columns)
@@ -0,0 +1,126 @@
+"""
+Synthetic housing data for House Price Predictor
+Used by setup.py and standalone.py for the demo model, and for load and scale testing.
+Run: python datagen.py --rows 5000000 --out houses.csv
+
+Rows are generated in vectorized chunks from one seeded random stream, so
+millions of rows can be written to CSV or Parquet without holding them in
+memory. The first chunk is always DEMO_ROWS long, so with seed 42 any file
+of at least 1000 rows starts with the original demo dataset.
+"""
+import argparse
+import time
+
+import numpy as np
+
+COLUMNS = [
+    'bedrooms', 'bathrooms', 'sqft_living', 'floors', 'waterfront', 'view',
+    'condition', 'grade', 'sqft_above', 'sqft_basement', 'yr_built',
+    'yr_renovated', 'lat', 'long', 'sqft_living15', 'price'
+]
+RENOVATION_YEARS = np.array([0] + list(range(1950, 2024)))
+# Size of the demo dataset, generate_houses(DEMO_ROWS, seed=42)
+DEMO_ROWS = 1000
+
+
+def generate_houses(n_samples, seed=42, rng=None):
+    """Return a dict of column arrays for n_samples synthetic houses
+
+    Pass a shared np.random.RandomState as `rng` to continue one random
+    stream across chunks; otherwise a new one is seeded with `seed`.
+    """
+    rng = np.random.RandomState(seed) if rng is None else rng
+    data = {
+        'bedrooms': rng.randint(1, 6, n_samples),
+        'bathrooms': rng.uniform(1, 4, n_samples),
+        'sqft_living': rng.randint(800, 5000, n_samples),
+        'floors': rng.choice([1, 1.5, 2, 2.5, 3], n_samples),
+        'waterfront': rng.choice([0, 1], n_samples, p=[0.99, 0.01]),
+        'view': rng.randint(0, 5, n_samples),
+        'condition': rng.randint(1, 6, n_samples),
+        'grade': rng.randint(4, 12, n_samples),
+        'sqft_above': rng.randint(600, 4000, n_samples),
+        'sqft_basement': rng.randint(0, 2000, n_samples),
+        'yr_built': rng.randint(1900, 2024, n_samples),
+        'yr_renovated': rng.choice(RENOVATION_YEARS, n_samples),
+        'lat': rng.uniform(47.4, 47.8, n_samples),
+        'long': rng.uniform(-122.4, -122.0, n_samples),
+        'sqft_living15': rng.randint(800, 5000, n_samples),
+        'price': rng.uniform(15, 150, n_samples)  # in $100k
+    }
+
+    # Adjust price based on key features
+    price = data['price']
+    price += data['sqft_living'] * 0.02  # $200 per sqft
+    price += data['bedrooms'] * 5  # $500k per bedroom
+    price += data['waterfront'] * 50  # $5M for waterfront
+    price += data['view'] * 10  # $1M per view level
+    return data
+
+
+def iter_chunks(n_rows, chunk_size=500000, seed=42):
+    """Yield dicts of column arrays covering n_rows houses, chunk_size at a time
+
+    Each column is drawn a chunk at a time, so the rows depend on the chunk
+    sizes. The first chunk is DEMO_ROWS long to keep the demo rows first.
+    """
+    rng = np.random.RandomState(seed)
+    start = 0
+    while start < n_rows:
+        size = min(DEMO_ROWS if start == 0 else chunk_size, n_rows - start)
+        yield generate_houses(size, rng=rng)
+        start += size
+
+
+def write_csv(path, n_rows, chunk_size=500000, seed=42):
+    """Write n_rows synthetic houses to a CSV file chunk by chunk"""
+    import pandas as pd
+
+    for i, chunk in enumerate(iter_chunks(n_rows, chunk_size, seed)):
+        pd.DataFrame(chunk, columns=COLUMNS).to_csv(
+            path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+
+def write_parquet(path, n_rows, chunk_size=500000, seed=42):
+    """Write n_rows synthetic houses to a Parquet file, one row group per chunk
+
+    Requires pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow")
+
+    writer = None
+    try:
+        for chunk in iter_chunks(n_rows, chunk_size, seed):
+            table = pa.table({name: chunk[name] for name in COLUMNS})
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic housing data')
+    parser.add_argument('--rows', type=int, default=1000, help='number of houses (default 1000)')
+    parser.add_argument('--out', default='houses.csv', help='output .csv or .parquet file')
+    parser.add_argument('--chunk-size', type=int, default=500000,
+                        help='rows generated per chunk (default 500000)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.out.lower().endswith('.parquet'):
+        write_parquet(args.out, args.rows, args.chunk_size, args.seed)
+    else:
+        write_csv(args.out, args.rows, args.chunk_size, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"✓ Wrote {args.rows:,} houses to {args.out} in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
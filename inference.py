@@ -0,0 +1,253 @@
+"""
+Shared prediction helpers for the House Price Predictor
+Used by both app.py and standalone.py so every route scores houses the same way
+"""
+import warnings
+
+import numpy as np
+
+
+class InvalidRecord:
+    """Stands in for a record that could not be parsed, carrying the reason"""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def extract_features(data, feature_names):
+    """Return the feature values of one house in model order
+
+    Raises KeyError naming the first missing feature.
+    """
+    return [float(data[feature]) for feature in feature_names]
+
+
+def build_feature_matrix(records, feature_names, buffer=None):
+    """Build one (N, n_features) matrix from a list of house records
+
+    Returns the matrix of valid rows, the indexes of those rows in `records`
+    and a dict mapping the index of every rejected row to its error message.
+    `buffer(n)` supplies the matrix to fill, such as Float32Predictor.buffer;
+    by default a new float64 matrix is allocated.
+    """
+    matrix = buffer(len(records)) if buffer is not None else np.empty((len(records), len(feature_names)))
+    rows = []
+    errors = {}
+    for i, record in enumerate(records):
+        if isinstance(record, InvalidRecord):
+            errors[i] = record.message
+            continue
+        if not isinstance(record, dict):
+            errors[i] = 'Record must be a JSON object'
+            continue
+        try:
+            matrix[len(rows)] = extract_features(record, feature_names)
+        except KeyError as e:
+            errors[i] = f'Missing feature: {e.args[0]}'
+            continue
+        except (TypeError, ValueError) as e:
+            errors[i] = str(e)
+            continue
+        rows.append(i)
+    return matrix[:len(rows)], rows, errors
+
+
+def format_prediction(prediction):
+    """Return the JSON body for one predicted price (in $100k)"""
+    return {
+        'predicted_price': round(prediction, 2),
+        'predicted_price_formatted': f'${prediction * 100000:,.0f}'
+    }
+
+
+def predict_records(predictor, records, feature_names):
+    """Score a list of house records with a single predict call
+
+    Returns one result per record, either a prediction or an error.
+    """
+    matrix, rows, errors = build_feature_matrix(records, feature_names)
+    results = [None] * len(records)
+    for i, message in errors.items():
+        results[i] = {'error': message}
+    if rows:
+        predictions = predictor.predict(matrix)
+        for i, prediction in zip(rows, predictions):
+            results[i] = format_prediction(prediction)
+    return results
+
+
+def sweep_matrix(base, axes):
+    """Build the grid of houses for a what-if sweep
+
+    `base` is one house in model order and `axes` a list of one or two
+    (column index, values) pairs. Returns a (len(values_1) * len(values_2),
+    n_features) matrix, row-major over the axes, that scores in one call.
+    """
+    shape = [len(values) for _, values in axes]
+    matrix = np.tile(np.asarray(base, dtype=np.float64), (int(np.prod(shape)), 1))
+    grids = np.meshgrid(*[np.asarray(values, dtype=np.float64) for _, values in axes], indexing='ij')
+    for (column, _), grid in zip(axes, grids):
+        matrix[:, column] = grid.ravel()
+    return matrix
+
+
+class CompiledPredictor:
+    """A StandardScaler + linear regression pipeline folded into one dot product
+
+    The scaler is folded into the coefficients at load time, so a prediction is
+    X @ weights + bias with no sklearn validation or transform steps.
+    """
+
+    def __init__(self, coef, intercept, center, scale):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.center = np.asarray(center, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.weights = self.coef / self.scale
+        self.bias = self.intercept - float(self.center @ self.weights)
+        # Global importance: share of the price swing from a one standard
+        # deviation change in each feature
+        magnitude = np.abs(self.coef)
+        total = magnitude.sum()
+        self.importances = magnitude / total if total > 0 else magnitude
+
+    @classmethod
+    def from_pipeline(cls, model):
+        """Compile a fitted Pipeline(StandardScaler, LinearRegression)
+
+        Raises ValueError if the model is not a scaler followed by a linear model.
+        """
+        steps = getattr(model, 'steps', None)
+        if not steps or len(steps) != 2:
+            raise ValueError('Expected a two-step scaler + regressor Pipeline')
+        scaler, regressor = steps[0][1], steps[1][1]
+        if not hasattr(scaler, 'mean_') or not hasattr(regressor, 'coef_'):
+            raise ValueError('Pipeline is not a fitted scaler + linear model')
+        coef = np.asarray(regressor.coef_, dtype=np.float64)
+        if coef.ndim != 1:
+            raise ValueError('Only single-target linear models can be compiled')
+        n_features = coef.shape[0]
+        center = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        return cls(coef, regressor.intercept_, center, scale)
+
+    def predict(self, X):
+        """Predict prices (in $100k) for an (N, n_features) matrix"""
+        return np.asarray(X, dtype=np.float64) @ self.weights + self.bias
+
+    def explain(self, X):
+        """Return the exact price contribution of every feature for every row of X
+
+        A contribution is the scaled value times its coefficient, so each row
+        sums to its predicted price minus `intercept`, the price of the
+        average training house.
+        """
+        return (np.asarray(X, dtype=np.float64) - self.center) * self.weights
+
+
+class Float32Predictor:
+    """A CompiledPredictor that scores in float32 with reusable buffers
+
+    Weights and input buffers are float32, halving the memory traffic of bulk
+    scoring. Rows are centred on the training mean before the dot product, so
+    float32 rounding applies to small offsets instead of raw values such as
+    years and square footage. Parse inputs straight into `buffer(n)`, which
+    predict then centres in place. It is a column-major view of one flat array,
+    so it is contiguous for any row count and single-precision BLAS scores
+    it without a copy. The buffers are reused from call to call: the returned
+    prices are only valid until the next call, and one predictor must not be
+    shared between threads. Use it for bulk scoring, not in servers.
+    """
+
+    dtype = np.float32
+
+    def __init__(self, compiled, capacity=10000):
+        self.compiled = compiled
+        self.center = compiled.center.astype(np.float32)
+        self.weights = compiled.weights.astype(np.float32)
+        self.intercept = np.float32(compiled.intercept)
+        self.deviation = None  # max dollar deviation from float64, set by load_float32_predictor
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self._storage = np.empty(capacity * len(self.weights), dtype=np.float32)
+        self._prices = np.empty(capacity, dtype=np.float32)
+
+    def buffer(self, n):
+        """Return an uninitialized (n, n_features) float32 matrix in the reusable input buffer"""
+        if n > len(self._prices):
+            self._allocate(n)
+        return self._storage[:n * len(self.weights)].reshape((n, len(self.weights)), order='F')
+
+    def predict(self, X):
+        """Predict prices (in $100k) for an (N, n_features) matrix, as float32
+
+        A matrix from buffer() is overwritten; any other input is left as is.
+        """
+        X = np.asarray(X)
+        if X.base is self._storage and X.flags.f_contiguous:
+            rows = X
+        else:
+            rows = self.buffer(len(X))
+        prices = self._prices[:len(X)]
+        np.subtract(X, self.center, out=rows)
+        np.dot(rows, self.weights, out=prices)
+        prices += self.intercept
+        return prices
+
+
+def load_float32_predictor(predictor, tolerance_dollars, capacity=10000):
+    """Return a Float32Predictor for predictor, or predictor itself if float32 is refused
+
+    The float32 path is checked against the float64 one on a smoke batch and
+    refused when any price differs by more than tolerance_dollars.
+    """
+    if not isinstance(predictor, CompiledPredictor):
+        print("⚠ float32 scoring refused: it needs a compiled linear model")
+        return predictor
+    candidate = Float32Predictor(predictor, capacity)
+    X = smoke_batch(predictor.center, predictor.scale)
+    expected = predictor.predict(X)
+    # Inputs are parsed as float32 too, so round the batch the same way
+    batch = candidate.buffer(len(X))
+    batch[...] = X
+    prices = candidate.predict(batch).astype(np.float64)
+    deviation = float(np.max(np.abs(prices - expected))) * 100000
+    if not deviation <= tolerance_dollars:
+        print(f"⚠ float32 scoring refused: prices deviate by up to ${deviation:,.2f} (tolerance ${tolerance_dollars:,.2f})")
+        return predictor
+    candidate.deviation = deviation
+    print(f"✓ float32 scoring: prices deviate by up to ${deviation:,.2f} from float64")
+    return candidate
+
+
+def smoke_batch(center, scale, n_rows=256, seed=0):
+    """Return a reproducible batch of synthetic houses around the training data"""
+    rng = np.random.default_rng(seed)
+    return center + rng.standard_normal((n_rows, len(center))) * scale
+
+
+def load_predictor(model, tolerance=1e-6):
+    """Return the fastest predictor that agrees with `model`
+
+    The model is compiled to a CompiledPredictor when possible and checked
+    against model.predict on a smoke batch. If it cannot be compiled, or the
+    two disagree by more than `tolerance` (in $100k), the sklearn model itself
+    is returned.
+    """
+    try:
+        compiled = CompiledPredictor.from_pipeline(model)
+    except ValueError as e:
+        print(f"⚠ Using sklearn predict: {e}")
+        return model
+
+    X = smoke_batch(compiled.center, compiled.scale)
+    with warnings.catch_warnings():
+        # Pipelines fitted on a DataFrame warn about the missing column names
+        warnings.simplefilter('ignore', UserWarning)
+        expected = model.predict(X)
+    deviation = float(np.max(np.abs(compiled.predict(X) - expected)))
+    if not deviation <= tolerance:
+        print(f"⚠ Using sklearn predict: compiled model deviates by {deviation:.3g}")
+        return model
+    return compiled
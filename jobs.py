@@ -0,0 +1,403 @@
+"""
+Background bulk scoring jobs for House Price Predictor
+
+A job scores an uploaded CSV or JSONL file of houses with the same chunked,
+vectorized code as score.py. The file is split into chunks of lines that are
+parsed, scored and formatted in a pool of worker processes, so bulk work uses
+every core without holding the GIL of the process serving /predict. The workers
+also run at a lower CPU priority. Results are written to a file in the job
+directory for download.
+
+The caps on queued and running jobs hold across all server processes sharing
+the jobs directory: each job's state file records the process running it, and
+admission is serialized with a lock file there. A server process that stops
+gives its jobs a grace period, then marks the unfinished ones failed. Workers
+run in their own process group and exit when their server process does.
+
+Workers load the model from the files on disk. A job names the version it
+needs and fails if the files hold another one, for example after a retrain.
+"""
+import contextlib
+import csv
+import glob
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single server process, nothing to coordinate
+    fcntl = None
+
+from score import (check_columns, csv_chunk_matrix, file_format, first_jsonl_record, format_results,
+                   parse_jsonl_line, score_chunks, write_header)
+
+# Set in each worker process by _init_worker
+_model = None
+
+# Seconds a queued job waits before checking again for a free running slot
+SLOT_POLL_INTERVAL = 0.5
+
+# Seconds between a worker's checks that the server process that started it is alive
+PARENT_POLL_INTERVAL = 1.0
+
+
+def _process_alive(pid):
+    """Return whether the server process that owns a job is still running"""
+    if pid == os.getpid():
+        return True
+    if pid is None or os.name == 'nt':
+        return False  # os.kill would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _exit_with_parent(parent):
+    """Exit the worker once the server process that started it is gone"""
+    while os.getppid() == parent:
+        time.sleep(PARENT_POLL_INTERVAL)
+    os._exit(1)
+
+
+def _init_worker(model_paths, niceness, float32_tolerance, chunk_size):
+    global _model
+    # Leave the server's process group: a Ctrl+C or a stop signal sent to the
+    # group is for the server process, which drains or fails its jobs and then
+    # stops this pool. If the server dies without doing so, the worker exits too
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), name='parent-watch', daemon=True).start()
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+    _model = {'paths': model_paths, 'version': None, 'predictor': None, 'feature_names': None,
+              'float32_tolerance': float32_tolerance, 'chunk_size': chunk_size}
+
+
+def _worker_model(version):
+    """Return (predictor, feature_names), reloading the model files if the job wants a new version
+
+    Raises ValueError if the files on disk are not that version, so a job never
+    scores with a model other than the one it reports.
+    """
+    if _model['version'] != version:
+        from artifact import load_serving_model
+        from registry import file_digest
+        predictor, feature_names, source = load_serving_model(*_model['paths'])
+        loaded = file_digest(source, _model['paths'][2])
+        if loaded != version:
+            raise ValueError(f'the model files on disk are version {loaded}, not {version}')
+        if _model['float32_tolerance'] is not None:
+            from inference import load_float32_predictor
+            predictor = load_float32_predictor(predictor, _model['float32_tolerance'], _model['chunk_size'])
+        _model.update(version=version, predictor=predictor, feature_names=feature_names)
+    return _model['predictor'], _model['feature_names']
+
+
+def _score_lines(version, in_format, out_format, header, lines, first_row):
+    """Parse, score and format one chunk of input lines (runs in a worker process)
+
+    Returns the output text, the row count and the float32 price deviation in
+    dollars (None when the chunk was scored in float64).
+    """
+    from inference import build_feature_matrix
+
+    predictor, feature_names = _worker_model(version)
+    buffer = getattr(predictor, 'buffer', None)
+    if in_format == 'csv':
+        parsed = csv_chunk_matrix(header, list(csv.reader(lines)), feature_names, buffer)
+    else:
+        records = [parse_jsonl_line(line) for line in lines]
+        parsed = build_feature_matrix(records, feature_names, buffer)
+    (prices, errors), = score_chunks([parsed], predictor)
+    return format_results(out_format, prices, errors, first_row), len(prices), getattr(predictor, 'deviation', None)
+
+
+class Job:
+    """State of one scoring job, as reported by GET /jobs/<id>
+
+    The state is also saved to job.json in the job directory, so any process
+    of a multi-worker server can answer for a job another one is running.
+    """
+
+    FIELDS = ('id', 'input_path', 'output_path', 'model_version', 'input_name', 'status', 'error',
+              'rows', 'bytes_total', 'bytes_read', 'created', 'started', 'finished', 'float32_deviation', 'pid')
+
+    def __init__(self, job_id, input_path, output_path, model_version, input_name):
+        self.id = job_id
+        self.input_path = input_path
+        self.output_path = output_path
+        self.model_version = model_version
+        self.input_name = input_name
+        self.status = 'queued'
+        self.error = None
+        self.rows = 0
+        self.bytes_total = os.path.getsize(input_path)
+        self.bytes_read = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.float32_deviation = None
+        self.pid = os.getpid()
+
+    def save(self):
+        path = os.path.join(os.path.dirname(self.output_path), 'job.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({name: getattr(self, name) for name in self.FIELDS}, f)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """Return the Job saved at path, or None"""
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls.__new__(cls)
+        for name in cls.FIELDS:
+            setattr(job, name, state.get(name))
+        return job
+
+    def info(self):
+        elapsed = None
+        if self.started is not None:
+            elapsed = round((self.finished or time.time()) - self.started, 3)
+        return {
+            'id': self.id,
+            'status': self.status,
+            'input': self.input_name,
+            'model_version': self.model_version,
+            'rows': self.rows,
+            'progress': 1.0 if self.status == 'done' else
+                        round(self.bytes_read / self.bytes_total, 4) if self.bytes_total else 0.0,
+            'elapsed_seconds': elapsed,
+            # Largest float32 price deviation in dollars; None if scored in float64
+            'float32_deviation_dollars': self.float32_deviation,
+            'error': self.error
+        }
+
+
+class JobManager:
+    """Queue and run scoring jobs on a shared process pool
+
+    At most `max_running` jobs run at once; up to `max_queued` more wait for a
+    slot and further submissions are refused. Both caps count the jobs of every
+    server process sharing `jobs_dir`. Each running job keeps at most
+    two chunks per worker in flight, so memory stays bounded whatever the file
+    size. Finished jobs beyond `keep` are deleted, oldest first. With
+    `float32_tolerance` (dollars) set, workers score in float32 unless that
+    moves prices by more than the tolerance.
+    """
+
+    def __init__(self, jobs_dir, model_paths, workers=None, max_running=2, max_queued=8,
+                 chunk_size=10000, keep=50, niceness=10, float32_tolerance=None):
+        self.jobs_dir = jobs_dir
+        self.model_paths = model_paths
+        self.workers = workers or max((os.cpu_count() or 2) - 1, 1)
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.chunk_size = chunk_size
+        self.keep = keep
+        self.niceness = niceness
+        self.float32_tolerance = float32_tolerance
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._pool = None
+        self._runner = ThreadPoolExecutor(max_running, thread_name_prefix='scoring-job')
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _get_pool(self):
+        # Started on first use so servers that never get a job pay nothing;
+        # spawned rather than forked because the server process runs threads
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker, initargs=(self.model_paths, self.niceness, self.float32_tolerance, self.chunk_size))
+            return self._pool
+
+    @contextlib.contextmanager
+    def _dir_lock(self):
+        """Serialize job admission across the server processes sharing jobs_dir"""
+        with self._lock, open(os.path.join(self.jobs_dir, '.lock'), 'w') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _active_jobs(self):
+        """Return the queued and running jobs of every live server process"""
+        active = []
+        for path in glob.glob(os.path.join(self.jobs_dir, '*', 'job.json')):
+            job = self.jobs.get(os.path.basename(os.path.dirname(path))) or Job.load(path)
+            if job is not None and job.status in ('queued', 'running') and _process_alive(job.pid):
+                active.append(job)
+        return active
+
+    def new_job_dir(self):
+        """Create and return (job_id, directory) for a new job's input file"""
+        job_id = uuid.uuid4().hex[:16]
+        directory = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(directory)
+        return job_id, directory
+
+    def submit(self, job_id, input_path, model_version, feature_names, output_format='csv', input_name=None):
+        """Check the input columns and queue the job; raises ValueError or OverflowError"""
+        in_format = file_format(input_path)
+        with open(input_path, newline='') as f:
+            if in_format == 'csv':
+                first = next(csv.reader(f), [])
+            else:
+                first = first_jsonl_record(f)
+        check_columns(first, feature_names)
+
+        output_path = os.path.join(self.jobs_dir, job_id, f'predictions.{output_format}')
+        job = Job(job_id, input_path, output_path, model_version,
+                  input_name or os.path.basename(input_path))
+        if self._stopping.is_set():
+            raise OverflowError('The server process is stopping')
+        with self._dir_lock():
+            waiting = len(self._active_jobs())
+            if waiting >= self.max_running + self.max_queued:
+                raise OverflowError(f'Too many jobs: {waiting} queued or running')
+            self.jobs[job_id] = job
+            job.save()
+        self._runner.submit(self._run, job, in_format, output_format)
+        self._evict()
+        return job
+
+    def get(self, job_id):
+        """Return a job of this process, or one saved by another server process"""
+        job = self.jobs.get(job_id)
+        if job is None and job_id.isalnum():
+            job = self._load(os.path.join(self.jobs_dir, job_id, 'job.json'))
+        return job
+
+    def list(self):
+        """Return the jobs of every server process, oldest first"""
+        found = []
+        for path in glob.glob(os.path.join(self.jobs_dir, '*', 'job.json')):
+            job = self.jobs.get(os.path.basename(os.path.dirname(path))) or self._load(path)
+            if job is not None:
+                found.append(job)
+        return sorted(found, key=lambda job: job.created or 0)
+
+    @staticmethod
+    def _load(path):
+        """Load a job saved by another server process, failed if that process exited"""
+        job = Job.load(path)
+        if job is not None and job.status in ('queued', 'running') and not _process_alive(job.pid):
+            job.status = 'failed'
+            job.error = 'The server process running the job exited'
+        return job
+
+    def _chunks(self, f, in_format):
+        """Yield (header, lines, first_row, chars read) chunks of raw input lines"""
+        header_line = f.readline() if in_format == 'csv' else ''
+        header = next(csv.reader([header_line])) if in_format == 'csv' else None
+        first_row = 0
+        read = len(header_line)
+        while True:
+            lines = list(itertools.islice(f, self.chunk_size))
+            if not lines:
+                return
+            read += sum(map(len, lines))
+            if in_format != 'csv':
+                lines = [line for line in lines if line.strip()]
+            yield header, lines, first_row, read
+            first_row += len(lines)
+
+    def _start(self, job):
+        """Wait until fewer than max_running jobs run in any server process, then mark job running"""
+        while not self._stopping.is_set():
+            with self._dir_lock():
+                if sum(j.status == 'running' for j in self._active_jobs()) < self.max_running:
+                    job.status = 'running'
+                    job.started = time.time()
+                    job.save()
+                    return True
+            self._stopping.wait(SLOT_POLL_INTERVAL)
+        return False
+
+    def _run(self, job, in_format, out_format):
+        if not self._start(job):
+            return
+        try:
+            pool = self._get_pool()
+            pending = deque()
+            with open(job.input_path, newline='') as f, open(job.output_path, 'w', newline='') as out:
+                write_header(out, out_format)
+                for header, lines, first_row, read in self._chunks(f, in_format):
+                    pending.append(pool.submit(_score_lines, job.model_version, in_format, out_format,
+                                               header, lines, first_row))
+                    job.bytes_read = min(read, job.bytes_total)
+                    # Write finished chunks in order, keeping the pool busy but bounded
+                    while len(pending) >= 2 * self.workers or (pending and pending[0].done()):
+                        self._write(job, out, pending.popleft())
+                while pending:
+                    self._write(job, out, pending.popleft())
+            job.status = 'done'
+        except Exception as e:
+            # Keep the reason shutdown() gave when it stopped the pool under the job
+            if job.status != 'failed':
+                job.status = 'failed'
+                job.error = f'{type(e).__name__}: {e}'
+        finally:
+            job.finished = time.time()
+            job.save()
+
+    def _write(self, job, out, future):
+        text, n_rows, deviation = future.result()
+        out.write(text)
+        job.rows += n_rows
+        job.float32_deviation = deviation
+        job.save()
+
+    def _evict(self):
+        with self._lock:
+            finished = [j for j in self.jobs.values() if j.status in ('done', 'failed')]
+            for job in finished[:max(len(finished) - self.keep, 0)]:
+                del self.jobs[job.id]
+                shutil.rmtree(os.path.join(self.jobs_dir, job.id), ignore_errors=True)
+
+    def shutdown(self, timeout=30.0):
+        """Stop taking jobs, wait up to `timeout` seconds for running ones, then fail the rest
+
+        Called before a server process exits, so no job is left reported as
+        running by a process that no longer exists.
+        """
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and any(j.status == 'running' for j in list(self.jobs.values())):
+            time.sleep(0.05)
+        for job in list(self.jobs.values()):
+            if job.status in ('queued', 'running'):
+                job.status = 'failed'
+                job.error = 'The server process stopped before the job finished'
+                job.finished = time.time()
+                job.save()
+        if self._pool is not None:
+            # A worker may still be scoring a chunk of a job that was just failed
+            for process in list((getattr(self._pool, '_processes', None) or {}).values()):
+                process.kill()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self, listed=None):
+        counts = {}
+        for job in listed if listed is not None else self.list():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {'workers': self.workers, 'max_running': self.max_running,
+                'max_queued': self.max_queued, 'float32_tolerance': self.float32_tolerance,
+                'by_status': counts}
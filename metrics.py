@@ -0,0 +1,377 @@
+"""
+Lightweight in-process metrics for House Price Predictor
+Histograms, counters and gauges rendered in the Prometheus text format.
+"""
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Bucket bounds (seconds) for request and stage latency histograms
+LATENCY_BUCKETS = [0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                   0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+
+
+class Histogram:
+    """Fixed-bucket histogram of observed values
+
+    `buckets` are the inclusive upper bounds; values above the last bound are
+    counted in an implicit +Inf bucket.
+    """
+
+    def __init__(self, buckets, lock=None):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = lock or threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._add(value)
+
+    def _add(self, value):
+        """Record a value; the caller must hold the histogram's lock"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def _add_many(self, values):
+        """Record a list of values at once; the caller must hold the lock"""
+        indexes = np.searchsorted(self.buckets, values, side='left')
+        for i, n in enumerate(np.bincount(indexes, minlength=len(self.counts)).tolist()):
+            self.counts[i] += n
+        self.sum += float(np.sum(values))
+        self.count += len(values)
+
+    def snapshot(self):
+        """Return the cumulative bucket counts, sum and count as a dict"""
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = []
+        running = 0
+        for bound, n in zip(self.buckets + ['+Inf'], counts):
+            running += n
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'sum': total, 'count': count}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_histogram(name, snapshot, labels=()):
+    """Return Prometheus sample lines for a Histogram.snapshot()"""
+    lines = []
+    for bound, count in snapshot['buckets']:
+        le = bound if bound == '+Inf' else repr(float(bound))
+        lines.append(f'{name}_bucket{_format_labels(tuple(labels) + (("le", le),))} {count}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(snapshot["sum"])}')
+    lines.append(f'{name}_count{_format_labels(labels)} {snapshot["count"]}')
+    return lines
+
+
+class _Family:
+    """A named metric with one child per combination of label values
+
+    Methods starting with an underscore expect the caller to hold `lock`,
+    which several families may share so they can be updated together.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), lock=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = lock or threading.Lock()
+        self._children = {}
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+    def _labels(self, values):
+        return tuple(zip(self.labelnames, values))
+
+
+class Counter(_Family):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self._add(labelvalues, amount)
+
+    def _add(self, labelvalues, amount):
+        self._children[labelvalues] = self._children.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._children.get(labelvalues, 0)
+
+    def render(self):
+        with self.lock:
+            children = sorted(self._children.items())
+        return self.header() + [f'{self.name}{_format_labels(self._labels(values))} {_format_value(v)}'
+                                for values, v in children]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, *labelvalues, value):
+        with self.lock:
+            self._children[labelvalues] = value
+
+
+class LabeledHistogram(_Family):
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets, labelnames=(), lock=None):
+        super().__init__(name, help, labelnames, lock)
+        self.buckets = buckets
+
+    def observe(self, *labelvalues, value):
+        with self.lock:
+            self._child(labelvalues)._add(value)
+
+    def _child(self, labelvalues):
+        histogram = self._children.get(labelvalues)
+        if histogram is None:
+            histogram = self._children[labelvalues] = Histogram(self.buckets, self.lock)
+        return histogram
+
+    def render(self):
+        with self.lock:
+            children = sorted(self._children.items())
+        lines = self.header()
+        for values, histogram in children:
+            lines += render_histogram(self.name, histogram.snapshot(), self._labels(values))
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together at /metrics
+
+    Collectors are callables returning extra Prometheus lines, for components
+    such as the micro-batcher that keep their own statistics. Hooks added with
+    before_render() run first, so buffered observations can be folded in.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._hooks = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=(), lock=None):
+        return self.register(Counter(name, help, labelnames, lock))
+
+    def gauge(self, name, help, labelnames=(), lock=None):
+        return self.register(Gauge(name, help, labelnames, lock))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, labelnames=(), lock=None):
+        return self.register(LabeledHistogram(name, help, buckets, labelnames, lock))
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def before_render(self, hook):
+        self._hooks.append(hook)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        for hook in self._hooks:
+            hook()
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            lines += collector()
+        return '\n'.join(lines) + '\n'
+
+
+class _NullTimer:
+    """Stand-in for StageTimer when instrumentation is switched off"""
+
+    __slots__ = ()
+
+    def mark(self, stage):
+        pass
+
+    def error(self, kind):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class StageTimer:
+    """Times consecutive stages of one request"""
+
+    __slots__ = ('stages', 'errors', '_last')
+
+    def __init__(self, started):
+        self.stages = []
+        self.errors = None
+        self._last = started
+
+    def mark(self, stage):
+        """Record the time since the previous mark as `stage`"""
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def error(self, kind):
+        if self.errors is None:
+            self.errors = []
+        self.errors.append(kind)
+
+
+class RequestMetrics:
+    """Per-endpoint request counters, in-flight gauges and stage latencies
+
+    Routes wrapped with track() receive a StageTimer as their first argument,
+    or a no-op timer when `enabled` is False.
+
+    The request path takes no lock: finished requests are appended to a deque
+    (atomic in CPython) and folded into the histograms in bulk when /metrics
+    is scraped, or by a background thread once `flush_every` requests are
+    waiting, so no request pays for the fold.
+    """
+
+    def __init__(self, registry, enabled=True, flush_every=10000):
+        self.enabled = enabled
+        self.flush_every = flush_every
+        self.lock = lock = threading.Lock()
+        self.requests = registry.counter(
+            'hpp_requests_total', 'Requests handled, by endpoint and HTTP status',
+            ('endpoint', 'status'), lock)
+        self.errors = registry.counter(
+            'hpp_errors_total', 'Request errors, by endpoint and error type',
+            ('endpoint', 'type'), lock)
+        self.in_flight = registry.gauge(
+            'hpp_requests_in_flight', 'Requests currently being handled', ('endpoint',), lock)
+        self.request_seconds = registry.histogram(
+            'hpp_request_seconds', 'Time to handle a request', labelnames=('endpoint',), lock=lock)
+        self.stage_seconds = registry.histogram(
+            'hpp_stage_seconds', 'Time spent in each stage of a request',
+            labelnames=('endpoint', 'stage'), lock=lock)
+        self._finished = deque()
+        self._active = {}
+        registry.before_render(self.flush)
+        if enabled:
+            self._start_flusher()
+            # A forked worker folds its own requests
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=self._start_flusher)
+
+    def _start_flusher(self):
+        self._wake = threading.Event()
+        threading.Thread(target=self._flush_when_woken, name='metrics-flush', daemon=True).start()
+
+    def _flush_when_woken(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Fold every finished request into the metric families"""
+        totals = {}
+        stages = {}
+        with self.lock:
+            while True:
+                try:
+                    endpoint, status, elapsed, timer = self._finished.popleft()
+                except IndexError:
+                    break
+                self.requests._add((endpoint, status), 1)
+                totals.setdefault(endpoint, []).append(elapsed)
+                for stage, seconds in timer.stages:
+                    key = (endpoint, stage)
+                    if key in stages:
+                        stages[key].append(seconds)
+                    else:
+                        stages[key] = [seconds]
+                if timer.errors:
+                    for kind in timer.errors:
+                        self.errors._add((endpoint, kind), 1)
+            for endpoint, values in totals.items():
+                self.request_seconds._child((endpoint,))._add_many(values)
+            for key, values in stages.items():
+                self.stage_seconds._child(key)._add_many(values)
+            for endpoint, active in self._active.items():
+                self.in_flight._children[(endpoint,)] = len(active)
+
+    def track(self, endpoint):
+        """Decorator instrumenting a Flask view as `endpoint`"""
+        active = self._active.setdefault(endpoint, set())
+        finished = self._finished
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(NULL_TIMER, *args, **kwargs)
+                start = time.perf_counter()
+                timer = StageTimer(start)
+                active.add(timer)
+                status = 500
+                try:
+                    response = view(timer, *args, **kwargs)
+                    status = response[1] if isinstance(response, tuple) else response.status_code
+                    return response
+                except Exception as e:
+                    timer.error(type(e).__name__)
+                    raise
+                finally:
+                    active.discard(timer)
+                    finished.append((endpoint, status, time.perf_counter() - start, timer))
+                    if len(finished) >= self.flush_every:
+                        self._wake.set()
+            return wrapper
+        return decorator
+
+
+class StartupTimer:
+    """Break process startup into named stages and report how long each took
+
+    Create it with the perf_counter() value taken before the first import and
+    call mark() at the end of every stage.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.stages = []
+        self._last = self.started
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def report(self, file=None):
+        """Print the stage breakdown (to stderr by default)"""
+        file = file or sys.stderr
+        total = self._last - self.started
+        print("Startup timing:", file=file)
+        for stage, seconds in self.stages:
+            print(f"  {stage:<12} {seconds * 1000:8.1f} ms", file=file)
+        print(f"  {'total':<12} {total * 1000:8.1f} ms", file=file)
@@ -0,0 +1,143 @@
+"""
+Compact request and response formats for bulk prediction
+
+application/x-hpp-matrix
+    Raw little-endian float32/float64 matrix with a small header:
+        4 bytes   magic b'HPPX'
+        uint8     format version
+        uint8     item size (4 = float32, 8 = float64)
+        uint16    number of columns
+        uint32    number of rows
+        uint32    length of the column names block
+        names     column names, UTF-8, separated by '\n'
+        padding   zero bytes up to an 8-byte boundary
+        data      rows * columns values, row-major
+
+application/x-hpp-columnar+json
+    One JSON array per column, e.g. {"bedrooms": [3, 4], "bathrooms": [2, 2.5], ...}
+
+Both decode straight into a NumPy matrix without building a dict per house.
+"""
+import json
+import struct
+
+import numpy as np
+
+MATRIX_TYPE = 'application/x-hpp-matrix'
+COLUMNAR_TYPE = 'application/x-hpp-columnar+json'
+CONTENT_TYPES = (MATRIX_TYPE, COLUMNAR_TYPE)
+
+MAGIC = b'HPPX'
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<4sBBHII')
+_DTYPES = {4: np.dtype('<f4'), 8: np.dtype('<f8')}
+
+
+class PayloadError(ValueError):
+    """Raised when a request body cannot be decoded"""
+
+
+def _order_columns(matrix, columns, feature_names):
+    """Return matrix with its columns in feature_names order"""
+    missing = [f for f in feature_names if f not in columns]
+    if missing:
+        raise PayloadError(f"Missing feature: {missing[0]}")
+    if list(columns) == list(feature_names):
+        return matrix
+    index = {name: i for i, name in enumerate(columns)}
+    return matrix[:, [index[f] for f in feature_names]]
+
+
+def encode_matrix(matrix, columns, dtype=np.float64):
+    """Return the application/x-hpp-matrix bytes for a 2-D array"""
+    dtype = np.dtype(dtype).newbyteorder('<')
+    if dtype.itemsize not in _DTYPES or dtype.kind != 'f':
+        raise PayloadError('Matrix values must be float32 or float64')
+    matrix = np.ascontiguousarray(matrix, dtype=dtype)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(-1, 1)
+    names = '\n'.join(columns).encode('utf-8')
+    header = _PREAMBLE.pack(MAGIC, FORMAT_VERSION, dtype.itemsize, matrix.shape[1], matrix.shape[0], len(names))
+    padding = b'\0' * (-(len(header) + len(names)) % 8)
+    return header + names + padding + matrix.tobytes()
+
+
+def decode_matrix(body):
+    """Return (matrix, columns) from application/x-hpp-matrix bytes
+
+    The matrix is a read-only view of `body`, not a copy.
+    """
+    if len(body) < _PREAMBLE.size:
+        raise PayloadError('Matrix payload is too short')
+    magic, version, itemsize, n_cols, n_rows, names_len = _PREAMBLE.unpack_from(body)
+    if magic != MAGIC:
+        raise PayloadError('Not an application/x-hpp-matrix payload')
+    if version > FORMAT_VERSION:
+        raise PayloadError(f'Unsupported matrix format version {version}')
+    if itemsize not in _DTYPES:
+        raise PayloadError(f'Unsupported item size {itemsize} (expected 4 or 8)')
+    start = _PREAMBLE.size + names_len
+    try:
+        columns = body[_PREAMBLE.size:start].decode('utf-8').split('\n') if names_len else []
+    except UnicodeDecodeError:
+        raise PayloadError('Column names are not valid UTF-8')
+    if len(columns) != n_cols:
+        raise PayloadError(f'Header lists {len(columns)} column names for {n_cols} columns')
+    start += -start % 8
+    expected = start + n_rows * n_cols * itemsize
+    if len(body) != expected:
+        raise PayloadError(f'Matrix payload is {len(body)} bytes, expected {expected}')
+    matrix = np.frombuffer(body, dtype=_DTYPES[itemsize], count=n_rows * n_cols, offset=start)
+    return matrix.reshape(n_rows, n_cols), columns
+
+
+def decode_columnar(body):
+    """Return (matrix, columns) from application/x-hpp-columnar+json bytes"""
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise PayloadError(f'Invalid JSON: {e}')
+    if not isinstance(data, dict) or not data:
+        raise PayloadError('Expected a JSON object with one array per feature')
+    columns = list(data)
+    try:
+        arrays = [np.asarray(data[c], dtype=np.float64) for c in columns]
+    except (TypeError, ValueError) as e:
+        raise PayloadError(str(e))
+    lengths = {a.shape for a in arrays}
+    if len(lengths) != 1 or arrays[0].ndim != 1:
+        raise PayloadError('Every feature must be a 1-D array of the same length')
+    return np.column_stack(arrays), columns
+
+
+def decode(content_type, body, feature_names):
+    """Decode a bulk request body into an (N, n_features) matrix in model order
+
+    Returns the matrix and the dtype to answer in. NaN and infinite feature
+    values are rejected, since their prices could not be encoded as JSON.
+    """
+    if content_type == MATRIX_TYPE:
+        matrix, columns = decode_matrix(body)
+    else:
+        matrix, columns = decode_columnar(body)
+    ordered = _order_columns(matrix, columns, feature_names)
+    finite = np.isfinite(ordered).all(axis=1)
+    if not finite.all():
+        raise PayloadError(f'Row {int(np.argmin(finite))} has a NaN or infinite feature value')
+    return ordered, matrix.dtype
+
+
+def encode_table(content_type, matrix, columns, dtype=np.float64):
+    """Encode an (N, len(columns)) result matrix in the request's format"""
+    if content_type == MATRIX_TYPE:
+        return encode_matrix(matrix, columns, dtype)
+    table = {name: np.round(matrix[:, i], 4).tolist() for i, name in enumerate(columns)}
+    table['count'] = len(matrix)
+    return json.dumps(table)
+
+
+def encode(content_type, prices, dtype=np.float64):
+    """Encode predicted prices (in $100k) in the request's format"""
+    if content_type == MATRIX_TYPE:
+        return encode_matrix(prices, ['predicted_price'], dtype)
+    return json.dumps({'predicted_price': np.round(prices, 2).tolist(), 'count': len(prices)})
@@ -0,0 +1,49 @@
+"""
+Precomputed responses for pages and metadata that never change while the server runs
+"""
+import gzip
+import hashlib
+import zlib
+
+from flask import Response
+
+# Content codings we can serve, in order of preference
+ENCODINGS = ['gzip', 'deflate', 'identity']
+
+
+class PrecomputedResponse:
+    """A response body built once, stored raw and gzip/deflate-compressed
+
+    Each encoding gets its own strong ETag, and conditional requests that
+    match it are answered with 304 Not Modified.
+    """
+
+    def __init__(self, body, mimetype, cache_control='public, max-age=300'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {'identity': (body, digest)}
+        for encoding, compressed in (('gzip', gzip.compress(body, 9, mtime=0)),
+                                     ('deflate', zlib.compress(body, 9))):
+            # Only keep compressed variants that are actually smaller
+            if len(compressed) < len(body):
+                self.variants[encoding] = (compressed, f'{digest}-{encoding}')
+
+    def respond(self, request):
+        """Return the Response (or 304) for a Flask request"""
+        encoding = request.accept_encodings.best_match(
+            [e for e in ENCODINGS if e in self.variants]) or 'identity'
+        body, etag = self.variants[encoding]
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
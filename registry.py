@@ -0,0 +1,261 @@
+"""
+Model registry with zero-downtime hot reload for House Price Predictor
+
+A background thread watches the model files. When setup.py writes a new model,
+it is loaded off the request path, checked against the serving version on a
+smoke batch and swapped in with a single reference assignment, so request
+threads never block or see a half-loaded model.
+
+Several versions stay resident. Requests can pin one with a header, a share of
+traffic can be sent to a canary version, and a shadow version can score every
+request alongside the served one for comparison.
+"""
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from artifact import load_serving_model
+
+
+class ModelVersion:
+    """One loaded model and where it came from
+
+    `scorer` is what request handlers predict with: the predictor itself, or
+    a wrapper that also shadow-scores when the registry has shadowing on.
+    """
+
+    def __init__(self, version, predictor, feature_names, source):
+        self.version = version
+        self.predictor = predictor
+        self.feature_names = feature_names
+        self.source = source
+        self.loaded_at = time.time()
+        self.deviation = None
+        self.scorer = predictor
+
+    def info(self):
+        return {
+            'version': self.version,
+            'source': os.path.basename(self.source),
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)),
+            'smoke_deviation': self.deviation
+        }
+
+
+class _ShadowScorer:
+    """Predicts with one version and lets the registry compare the shadow version"""
+
+    def __init__(self, registry, model):
+        self.registry = registry
+        self.model = model
+
+    def predict(self, X):
+        prices = self.model.predictor.predict(X)
+        self.registry.shadow_score(self.model, X, prices)
+        return prices
+
+
+def file_digest(*paths):
+    """Return a short content hash of the given files (missing files are skipped)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """Resident model versions, hot reload and per-request version routing
+
+    `smoke_batch` is an (N, n_features) matrix every new version must score
+    with finite prices; if `max_deviation` (in $100k) is set, a version whose
+    prices differ from the serving version by more than that is rejected.
+    With `canary_percent` > 0 or `shadow` set, new versions are not promoted
+    automatically: they receive that share of traffic (and shadow-score the
+    rest) until promote() is called. `disk_version` is the version of the
+    files last read from disk, which is not resident if it was rejected.
+    """
+
+    def __init__(self, artifact_path, model_path, features_path, smoke_batch=None,
+                 keep=3, poll_interval=2.0, max_deviation=None, canary_percent=0.0,
+                 shadow=False):
+        self.paths = (artifact_path, model_path, features_path)
+        self.smoke_batch = smoke_batch
+        self.keep = keep
+        self.poll_interval = poll_interval
+        self.max_deviation = max_deviation
+        self.canary_percent = canary_percent
+        self.shadow = shadow
+        self.canary = None
+        self.last_error = None
+        self.shadow_stats = {'count': 0, 'max_abs_diff': 0.0, 'sum_abs_diff': 0.0}
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._thread = None
+
+        model = self._load()
+        self._versions[model.version] = model
+        self.active = model
+        self._signature = self._file_signature()
+
+    def _file_signature(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load(self):
+        predictor, feature_names, source = load_serving_model(*self.paths)
+        version = file_digest(source, self.paths[2])
+        self.disk_version = version
+        model = ModelVersion(version, predictor, feature_names, source)
+        if self.shadow:
+            model.scorer = _ShadowScorer(self, model)
+        return model
+
+    def on_swap(self, listener):
+        """Call listener(model_version) whenever a new version starts serving"""
+        self._listeners.append(listener)
+
+    def start(self):
+        """Start watching the model files in a daemon thread"""
+        if self._thread is None:
+            self._start_thread()
+            # Each forked worker swaps versions in its own copy of the registry, so each polls the files
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _start_thread(self):
+        self._thread = threading.Thread(target=self._watch, name='model-registry', daemon=True)
+        self._thread.start()
+
+    def _restart_after_fork(self):
+        self._lock = threading.Lock()
+        self._start_thread()
+
+    def _watch(self):
+        pending = None
+        while True:
+            time.sleep(self.poll_interval)
+            signature = self._file_signature()
+            if signature == self._signature:
+                pending = None
+                continue
+            # Wait for the files to stop changing so a half-written retrain is not loaded
+            if signature != pending:
+                pending = signature
+                continue
+            self._signature = signature
+            pending = None
+            self.reload()
+
+    def validate(self, candidate, baseline):
+        """Raise ValueError if candidate cannot replace baseline; returns the smoke deviation"""
+        if list(candidate.feature_names) != list(baseline.feature_names):
+            raise ValueError('feature names changed; restart the server to change the input schema')
+        if self.smoke_batch is None:
+            return None
+        new = np.asarray(candidate.predictor.predict(self.smoke_batch), dtype=np.float64)
+        if new.shape != (len(self.smoke_batch),) or not np.all(np.isfinite(new)):
+            raise ValueError('smoke batch produced missing or non-finite prices')
+        old = np.asarray(baseline.predictor.predict(self.smoke_batch), dtype=np.float64)
+        deviation = float(np.max(np.abs(new - old)))
+        if self.max_deviation and deviation > self.max_deviation:
+            raise ValueError(f'smoke batch prices moved by up to {deviation:.3g} (limit {self.max_deviation:.3g})')
+        return deviation
+
+    def reload(self):
+        """Load the model files as a new version; returns it, or None if rejected"""
+        try:
+            candidate = self._load()
+            if candidate.version in self._versions:
+                return None
+            candidate.deviation = self.validate(candidate, self.active)
+        except Exception as e:
+            self.last_error = f'{type(e).__name__}: {e}'
+            print(f"⚠ Model reload rejected: {self.last_error}")
+            return None
+
+        self.last_error = None
+        with self._lock:
+            self._versions[candidate.version] = candidate
+            if self.canary_percent > 0 or self.shadow:
+                self.canary = candidate
+            else:
+                self._promote(candidate)
+            self._evict()
+        print(f"✓ Loaded model version {candidate.version} from {os.path.basename(candidate.source)}")
+        return candidate
+
+    def _promote(self, model):
+        self.active = model
+        if self.canary is model:
+            self.canary = None
+        for listener in self._listeners:
+            listener(model)
+
+    def promote(self, version):
+        """Make a resident version the one that serves by default"""
+        with self._lock:
+            self._promote(self._versions[version])
+
+    def _evict(self):
+        """Drop the oldest versions beyond `keep`, never the active or canary one"""
+        for version in list(self._versions):
+            if len(self._versions) <= self.keep:
+                break
+            if self._versions[version] not in (self.active, self.canary):
+                del self._versions[version]
+
+    def get(self, version):
+        """Return a resident ModelVersion, or None"""
+        return self._versions.get(version)
+
+    def choose(self, requested=None):
+        """Pick the version that serves one request
+
+        An explicitly requested version must be resident and raises KeyError
+        otherwise; without one the canary gets `canary_percent` of traffic and
+        the active version the rest.
+        """
+        if requested:
+            return self._versions[requested]
+        canary = self.canary
+        if canary is not None and random.random() * 100 < self.canary_percent:
+            return canary
+        return self.active
+
+    def shadow_score(self, served, matrix, prices):
+        """Score the same rows with the shadow version and record the difference"""
+        shadow = self.canary
+        if not self.shadow or shadow is None or shadow is served:
+            return
+        diff = np.abs(np.asarray(shadow.predictor.predict(matrix)) - prices)
+        with self._lock:
+            stats = self.shadow_stats
+            stats['count'] += len(diff)
+            stats['sum_abs_diff'] += float(diff.sum())
+            stats['max_abs_diff'] = max(stats['max_abs_diff'], float(diff.max(initial=0.0)))
+
+    def stats(self):
+        return {
+            'active': self.active.version,
+            'canary': self.canary.version if self.canary is not None else None,
+            'canary_percent': self.canary_percent,
+            'shadow': self.shadow,
+            'shadow_stats': dict(self.shadow_stats),
+            'last_error': self.last_error,
+            'versions': [m.info() for m in list(self._versions.values())]
+        }
@@ -0,0 +1,189 @@
+"""
+Replay recorded traffic from the audit log against a server
+Run: python replay.py audit-logs/ --url http://127.0.0.1:5000 --speed 10
+
+Requests are sent with their original spacing divided by --speed (0 = as
+fast as possible), so a load test reproduces the real mix of single and
+batch requests and its bursts. Files of several server workers are merged in
+time order. The report gives the achieved request rate, latency percentiles,
+errors, how far sending fell behind the schedule and, with --check, how many
+prices differ from the logged ones.
+"""
+import argparse
+import glob
+import gzip
+import heapq
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audit import FILE_PATTERN
+
+# Prices are returned rounded to the cent of $100k
+PRICE_TOLERANCE = 0.01
+
+
+def audit_files(paths):
+    """Expand directories into the audit files they hold"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, FILE_PATTERN)))
+        else:
+            files.append(path)
+    return files
+
+
+def read_entries(path):
+    """Yield the logged requests of one file as (ts, endpoint, body, logged prices)"""
+    feature_names = None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a crashed writer
+                if 'feature_names' in entry:
+                    feature_names = entry['feature_names']
+                    continue
+                if feature_names is None:
+                    continue
+                if 'price' in entry:
+                    house = dict(zip(feature_names, entry['features']))
+                    yield entry['ts'], 'predict', house, [entry['price']]
+                else:
+                    houses = [dict(zip(feature_names, row)) if row is not None else None
+                              for row in entry['features']]
+                    # Missing features were logged as null; leave them out as the client did
+                    houses = [{k: v for k, v in h.items() if v is not None} if h is not None else 'invalid'
+                              for h in houses]
+                    yield entry['ts'], 'predict_batch', houses, entry['prices']
+    except (EOFError, OSError) as e:
+        # A file still being written can end in a partial gzip member
+        print(f"⚠ Stopped reading {os.path.basename(path)}: {e}")
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+
+def returned_prices(endpoint, response):
+    if endpoint == 'predict':
+        return [response.get('predicted_price')]
+    return [r.get('predicted_price') for r in response.get('predictions', [])]
+
+
+def count_mismatches(logged, returned):
+    if len(logged) != len(returned):
+        return max(len(logged), len(returned))
+    return sum(a is not None and b is not None and abs(a - b) > PRICE_TOLERANCE or (a is None) != (b is None)
+               for a, b in zip(logged, returned))
+
+
+class Replayer:
+    """Send logged requests on schedule from a bounded pool of client threads"""
+
+    def __init__(self, url, speed, concurrency, check):
+        self.url = url.rstrip('/')
+        self.speed = speed
+        self.check = check
+        self.pool = ThreadPoolExecutor(concurrency)
+        # At most two requests per client waiting, so a slow server applies back-pressure
+        self.slots = threading.Semaphore(2 * concurrency)
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = {}
+        self.mismatches = 0
+        self.houses = 0
+        self.max_lag = 0.0
+
+    def send(self, endpoint, body, logged):
+        try:
+            start = time.perf_counter()
+            try:
+                response = post_json(f'{self.url}/{endpoint}', body)
+                error = None
+            except urllib.error.HTTPError as e:
+                response, error = None, f'HTTP {e.code}'
+            except OSError as e:
+                response, error = None, type(e).__name__
+            latency = time.perf_counter() - start
+            mismatches = count_mismatches(logged, returned_prices(endpoint, response)) \
+                if self.check and response is not None else 0
+            with self.lock:
+                self.latencies.append(latency)
+                self.houses += len(logged)
+                self.mismatches += mismatches
+                if error:
+                    self.errors[error] = self.errors.get(error, 0) + 1
+        finally:
+            self.slots.release()
+
+    def run(self, entries, limit=None):
+        first_ts = None
+        start = time.perf_counter()
+        for n, (ts, endpoint, body, logged) in enumerate(entries):
+            if limit is not None and n >= limit:
+                break
+            if first_ts is None:
+                first_ts = ts
+            if self.speed > 0:
+                due = start + (ts - first_ts) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.max_lag = max(self.max_lag, -delay)
+            self.slots.acquire()
+            self.pool.submit(self.send, endpoint, body, logged)
+        self.pool.shutdown(wait=True)
+        return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay audit-logged traffic against a server')
+    parser.add_argument('paths', nargs='+', help='audit log files or directories')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='server to replay against')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay at this multiple of the original rate (0 = as fast as possible)')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads (default 16)')
+    parser.add_argument('--limit', type=int, help='stop after this many requests')
+    parser.add_argument('--check', action='store_true', help='count prices that differ from the logged ones')
+    args = parser.parse_args(argv)
+
+    files = audit_files(args.paths)
+    if not files:
+        raise SystemExit("❌ No audit log files found")
+    print(f"Replaying {len(files)} file(s) against {args.url} at "
+          f"{'full speed' if args.speed <= 0 else f'{args.speed:g}x'}...")
+
+    entries = heapq.merge(*(read_entries(path) for path in files), key=lambda e: e[0])
+    replayer = Replayer(args.url, args.speed, args.concurrency, args.check)
+    elapsed = replayer.run(entries, args.limit)
+
+    latencies = np.array(replayer.latencies)
+    if not len(latencies):
+        raise SystemExit("❌ The audit logs hold no requests")
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    print(f"✓ {len(latencies):,} requests ({replayer.houses:,} houses) in {elapsed:.2f} s: "
+          f"{len(latencies) / elapsed:,.1f} req/s")
+    print(f"  Latency p50 {p50:.2f} ms, p90 {p90:.2f} ms, p99 {p99:.2f} ms")
+    print(f"  Fell behind schedule by up to {replayer.max_lag * 1000:.1f} ms")
+    if replayer.errors:
+        print(f"⚠ Errors: {', '.join(f'{k} x{v}' for k, v in sorted(replayer.errors.items()))}")
+    if args.check:
+        print(f"{'⚠' if replayer.mismatches else '✓'} {replayer.mismatches:,} prices differ from the log")
+
+
+if __name__ == '__main__':
+    main()
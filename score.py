@@ -0,0 +1,235 @@
+"""
+Bulk scoring for House Price Predictor
+Scores a CSV or JSONL file of houses without the Flask server.
+Run: python score.py houses.csv predictions.csv
+
+The input is read and scored in fixed-size chunks, so memory stays flat no
+matter how many rows the file has. With --float32, chunks are parsed and
+scored in float32 with reused buffers, after checking that prices stay within
+--float32-tolerance dollars of the float64 path.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from artifact import load_serving_model
+from inference import InvalidRecord, build_feature_matrix, load_float32_predictor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHUNK_SIZE = 10000
+# Largest price change in dollars accepted from float32 scoring; prices are written rounded to $1,000
+DEFAULT_FLOAT32_TOLERANCE = 100.0
+
+
+def file_format(path):
+    """Return 'jsonl' or 'csv' based on the file extension"""
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_csv_chunks(f, chunk_size):
+    """Yield (header, rows) with at most chunk_size rows of a CSV file"""
+    reader = csv.reader(f)
+    header = next(reader)
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield header, rows
+            rows = []
+    if rows:
+        yield header, rows
+
+
+def parse_jsonl_line(line):
+    """Return the record on one JSON Lines line, or an InvalidRecord if it is not valid JSON"""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return InvalidRecord(f'Invalid JSON: {e}')
+
+
+def first_jsonl_record(f):
+    """Return the first record of a JSON Lines file, skipping blank lines
+
+    Raises ValueError if that line is not a JSON object.
+    """
+    line = next((line for line in f if line.strip()), '{}')
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f'Invalid JSON on the first line: {e}')
+    if not isinstance(record, dict):
+        raise ValueError('The first line is not a JSON object')
+    return record
+
+
+def read_jsonl_chunks(f, chunk_size):
+    """Yield lists of at most chunk_size records from a JSON Lines file
+
+    Lines that are not valid JSON become InvalidRecord entries, which are
+    reported with the parse error on their own rows instead of stopping the run.
+    """
+    records = []
+    for line in f:
+        if not line.strip():
+            continue
+        records.append(parse_jsonl_line(line))
+        if len(records) == chunk_size:
+            yield records
+            records = []
+    if records:
+        yield records
+
+
+def check_columns(columns, feature_names):
+    """Raise ValueError if any model feature is missing from the input columns"""
+    missing = [f for f in feature_names if f not in columns]
+    if missing:
+        raise ValueError(f"Input is missing features: {', '.join(missing)}")
+
+
+def csv_chunk_matrix(header, rows, feature_names, buffer=None):
+    """Return the (N, n_features) matrix for a chunk of CSV rows
+
+    Falls back to row-by-row parsing when the chunk contains bad values, and
+    returns the valid row indexes and per-row errors like build_feature_matrix,
+    which also describes `buffer`.
+    """
+    columns = [header.index(f) for f in feature_names]
+    matrix = buffer(len(rows)) if buffer is not None else np.empty((len(rows), len(feature_names)))
+    try:
+        if rows:
+            matrix[...] = [[row[c] for c in columns] for row in rows]
+        return matrix, list(range(len(rows))), {}
+    except (ValueError, IndexError):
+        records = [dict(zip(header, row)) for row in rows]
+        return build_feature_matrix(records, feature_names, buffer)
+
+
+def parse_csv(f, chunk_size, feature_names, buffer=None):
+    """Yield (matrix, rows, errors) for each chunk of a CSV file"""
+    for header, rows in read_csv_chunks(f, chunk_size):
+        yield csv_chunk_matrix(header, rows, feature_names, buffer)
+
+
+def parse_jsonl(f, chunk_size, feature_names, buffer=None):
+    """Yield (matrix, rows, errors) for each chunk of a JSONL file"""
+    for records in read_jsonl_chunks(f, chunk_size):
+        yield build_feature_matrix(records, feature_names, buffer)
+
+
+def score_chunks(parsed, predictor):
+    """Yield (prices, errors) for every parsed chunk
+
+    prices holds NaN for the rows listed in errors.
+    """
+    for matrix, rows, errors in parsed:
+        prices = np.full(len(rows) + len(errors), np.nan)
+        if rows:
+            prices[rows] = predictor.predict(matrix)
+        yield prices, errors
+
+
+def format_results(fmt, prices, errors, first_row=0):
+    """Return the output text for one scored chunk
+
+    Each output row carries the 0-based input row number, the predicted price
+    and the error for rows that could not be scored.
+    """
+    rounded = np.round(prices, 2).tolist()
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            (first_row + i, '' if i in errors else price, errors.get(i, ''))
+            for i, price in enumerate(rounded)
+        )
+        return buffer.getvalue()
+    return ''.join(
+        json.dumps({'row': first_row + i, 'error': errors[i]} if i in errors
+                   else {'row': first_row + i, 'predicted_price': price}) + '\n'
+        for i, price in enumerate(rounded)
+    )
+
+
+def write_header(out, fmt):
+    if fmt == 'csv':
+        csv.writer(out).writerow(['row', 'predicted_price', 'error'])
+
+
+def write_results(out, fmt, scored):
+    """Stream scored chunks to an open output file and return the row count"""
+    write_header(out, fmt)
+    n_rows = 0
+    for prices, errors in scored:
+        out.write(format_results(fmt, prices, errors, n_rows))
+        n_rows += len(prices)
+    return n_rows
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB, or None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a CSV or JSONL file of houses')
+    parser.add_argument('input', help='input .csv or .jsonl file')
+    parser.add_argument('output', help='output .csv or .jsonl file')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'rows scored per vectorized call (default {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--float32', action='store_true', default=os.environ.get('FLOAT32_SCORING', '0') != '0',
+                        help='parse and score in float32 (also set by FLOAT32_SCORING=1)')
+    parser.add_argument('--float32-tolerance', type=float,
+                        default=float(os.environ.get('FLOAT32_TOLERANCE', DEFAULT_FLOAT32_TOLERANCE)),
+                        help=f'refuse float32 if any price moves by more than this many dollars '
+                             f'(default {DEFAULT_FLOAT32_TOLERANCE:g})')
+    parser.add_argument('--artifact', default=os.path.join(BASE_DIR, 'model.bin'))
+    parser.add_argument('--model', default=os.path.join(BASE_DIR, 'model.pkl'))
+    parser.add_argument('--features', default=os.path.join(BASE_DIR, 'features.pkl'))
+    args = parser.parse_args(argv)
+
+    predictor, feature_names, _ = load_serving_model(args.artifact, args.model, args.features)
+    if args.float32:
+        predictor = load_float32_predictor(predictor, args.float32_tolerance, args.chunk_size)
+    # Parse chunks straight into the float32 predictor's reusable input buffer
+    buffer = getattr(predictor, 'buffer', None)
+
+    in_format = file_format(args.input)
+    start = time.perf_counter()
+    with open(args.input, newline='') as f, open(args.output, 'w', newline='') as out:
+        # Check the columns up front instead of failing on every row
+        try:
+            first = next(csv.reader(f), []) if in_format == 'csv' else first_jsonl_record(f)
+            check_columns(first, feature_names)
+        except ValueError as e:
+            parser.error(str(e))
+        f.seek(0)
+        if in_format == 'csv':
+            parsed = parse_csv(f, args.chunk_size, feature_names, buffer)
+        else:
+            parsed = parse_jsonl(f, args.chunk_size, feature_names, buffer)
+        n_rows = write_results(out, file_format(args.output), score_chunks(parsed, predictor))
+    elapsed = time.perf_counter() - start
+
+    rate = n_rows / elapsed if elapsed > 0 else float('inf')
+    print(f"✓ Scored {n_rows:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    rss = peak_rss_mb()
+    if rss is not None:
+        print(f"  Peak RSS: {rss:.1f} MB")
+    print(f"✓ Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
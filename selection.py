@@ -0,0 +1,189 @@
+"""
+Cross-validated model selection for House Price Predictor
+Used by setup.py --select.
+
+Every candidate in a grid is scored with K-fold cross-validation in a pool of
+worker processes, one (candidate, fold) pair per task. The training matrix is
+written once to .npy files that the workers memory-map, so the data is not
+pickled into every task. Each candidate is reported with its cross-validated
+R² and RMSE, its fit time and its serving cost (latency for one house and
+time per house in a batch), measured with the predictor the server would use.
+Each worker is limited to one native thread (OpenMP and BLAS), so models that
+parallelize internally do not oversubscribe the cores the pool already uses
+and every candidate is timed under the same conditions.
+"""
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Model families and the parameter values to try; every combination is a candidate
+CANDIDATE_GRID = {
+    'linear': {},
+    'ridge': {'alpha': [0.1, 1.0, 10.0, 100.0]},
+    'random_forest': {'n_estimators': [100], 'max_depth': [None, 16], 'min_samples_leaf': [1, 5]},
+    'hist_gradient_boosting': {'max_iter': [200], 'learning_rate': [0.05, 0.1], 'max_leaf_nodes': [31]}
+}
+MODEL_FAMILIES = ('linear', 'ridge', 'random_forest', 'hist_gradient_boosting')
+
+# Single-house predictions timed per fold; the median is reported
+LATENCY_REPEATS = 50
+
+
+def expand_grid(grid):
+    """Return (name, family, params) for every parameter combination in grid"""
+    candidates = []
+    for family, params in grid.items():
+        if family not in MODEL_FAMILIES:
+            raise ValueError(f'Unknown model family {family!r}; expected one of {", ".join(MODEL_FAMILIES)}')
+        keys = sorted(params)
+        values = [v if isinstance(v, list) else [v] for v in (params[k] for k in keys)]
+        for combination in itertools.product(*values):
+            chosen = dict(zip(keys, combination))
+            label = ', '.join(f'{k}={v}' for k, v in chosen.items())
+            candidates.append((f'{family}({label})' if label else family, family, chosen))
+    return candidates
+
+
+def build_model(family, params):
+    """Return an unfitted model of one family
+
+    Linear families are scaled pipelines that the server compiles to a dot
+    product; tree ensembles are served with sklearn's predict.
+    """
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if family == 'linear':
+        from sklearn.linear_model import LinearRegression
+        return Pipeline([('scaler', StandardScaler()), ('regressor', LinearRegression(**params))])
+    if family == 'ridge':
+        from sklearn.linear_model import Ridge
+        return Pipeline([('scaler', StandardScaler()), ('regressor', Ridge(**params))])
+    if family == 'random_forest':
+        from sklearn.ensemble import RandomForestRegressor
+        # One core per fold: the pool already runs a fold on every core
+        return RandomForestRegressor(random_state=0, n_jobs=1, **params)
+    if family == 'hist_gradient_boosting':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        # Uses OpenMP threads, limited to one per worker by _init_worker
+        return HistGradientBoostingRegressor(random_state=0, **params)
+    raise ValueError(f'Unknown model family {family!r}')
+
+
+def serving_predictor(model):
+    """Return the compiled predictor for linear pipelines, otherwise the model itself"""
+    from inference import CompiledPredictor
+
+    try:
+        return CompiledPredictor.from_pipeline(model)
+    except ValueError:
+        return model
+
+
+# Memory-mapped training data, opened once per worker process
+_arrays = {}
+
+# Thread pool sizes read by OpenMP and the BLAS libraries when they load
+def _init_worker():
+    """Run one native thread per worker process"""
+    # The spawned worker re-imports setup.py, so numpy's BLAS and sklearn's
+    # OpenMP are already loaded and environment variables would come too late;
+    # threadpoolctl limits the loaded libraries directly
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+
+def _load_arrays(data_dir):
+    if _arrays.get('dir') != data_dir:
+        _arrays.clear()
+        _arrays['dir'] = data_dir
+        for name in ('X', 'y', 'folds'):
+            _arrays[name] = np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+    return _arrays['X'], _arrays['y'], _arrays['folds']
+
+
+def _score_fold(data_dir, family, params, fold):
+    """Fit one candidate without one fold and score it on that fold (runs in a worker process)"""
+    X, y, folds = _load_arrays(data_dir)
+    test = np.asarray(folds) == fold
+    model = build_model(family, params)
+
+    start = time.perf_counter()
+    model.fit(X[~test], y[~test])
+    fit_seconds = time.perf_counter() - start
+
+    predictor = serving_predictor(model)
+    X_test, y_test = X[test], np.asarray(y[test])
+    start = time.perf_counter()
+    residual = y_test - predictor.predict(X_test)
+    seconds_per_house = (time.perf_counter() - start) / len(y_test)
+
+    one = X_test[:1]
+    latencies = []
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        predictor.predict(one)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        'sse': float(residual @ residual),
+        'sst': float(np.sum((y_test - y_test.mean()) ** 2)),
+        'n': len(y_test),
+        'fit_seconds': fit_seconds,
+        'latency_seconds': float(np.median(latencies)),
+        'seconds_per_house': seconds_per_house
+    }
+
+
+def cross_validate(X, y, candidates, folds=5, workers=None, seed=0):
+    """Score every candidate with K-fold cross-validation; returns one result dict per candidate, best RMSE first"""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    if not 2 <= folds <= len(y):
+        raise ValueError(f'Need between 2 and {len(y)} folds, got {folds}')
+    fold_ids = np.random.RandomState(seed).permutation(len(y)) % folds
+
+    data_dir = tempfile.mkdtemp(prefix='hpp-cv-')
+    try:
+        np.save(os.path.join(data_dir, 'X.npy'), X)
+        np.save(os.path.join(data_dir, 'y.npy'), y)
+        np.save(os.path.join(data_dir, 'folds.npy'), fold_ids)
+        workers = workers or os.cpu_count() or 1
+        # Spawned like the job pool, so the workers start the same way on every platform
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker) as pool:
+            futures = [[pool.submit(_score_fold, data_dir, family, params, fold) for fold in range(folds)]
+                       for _, family, params in candidates]
+            scores = [[f.result() for f in candidate] for candidate in futures]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    results = []
+    for (name, family, params), fold_scores in zip(candidates, scores):
+        n = sum(s['n'] for s in fold_scores)
+        results.append({
+            'name': name,
+            'family': family,
+            'params': params,
+            'r2': float(np.mean([1 - s['sse'] / s['sst'] for s in fold_scores])),
+            'rmse': float(np.sqrt(sum(s['sse'] for s in fold_scores) / n)),
+            'fit_seconds': float(np.mean([s['fit_seconds'] for s in fold_scores])),
+            'latency_seconds': float(np.median([s['latency_seconds'] for s in fold_scores])),
+            'seconds_per_house': float(np.median([s['seconds_per_house'] for s in fold_scores]))
+        })
+    results.sort(key=lambda r: r['rmse'])
+    return results
+
+
+def select_best(results, max_latency=None):
+    """Return the result with the lowest RMSE among those priced within max_latency seconds"""
+    eligible = [r for r in results if max_latency is None or r['latency_seconds'] <= max_latency]
+    if not eligible:
+        raise ValueError(f'No candidate predicts one house within {max_latency * 1e6:.0f} us')
+    return min(eligible, key=lambda r: r['rmse'])
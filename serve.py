@@ -0,0 +1,186 @@
+"""
+Production server for House Price Predictor
+Run: python serve.py --workers 4 --port 5000
+
+The app (and its model) is imported once in a master process, which then
+binds the listening socket and forks the worker processes. Model pages are
+shared copy-on-write, so adding workers costs little memory. Each worker serves
+requests on a threaded Werkzeug server, without the debugger or reloader.
+
+The master restarts workers that exit. A worker exits by itself after
+--max-requests requests (worker recycling). SIGTERM or SIGINT stops the
+workers gracefully: they stop accepting connections and finish their
+in-flight requests first. Where fork() is not available (Windows), a single
+threaded server is started instead.
+
+Threads do not survive fork(). Components that run a background thread (the
+micro-batcher, the model registry's file watcher, the audit log writer and
+the request metrics flusher) restart it in each worker through
+os.register_at_fork.
+"""
+import argparse
+import importlib
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+
+class RequestCounter:
+    """WSGI middleware counting handled and in-flight requests"""
+
+    def __init__(self, app, max_requests, on_limit):
+        self.app = app
+        self.max_requests = max_requests
+        self.on_limit = on_limit
+        self.handled = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.in_flight += 1
+        try:
+            # The request is finished once the server closes the response body
+            return ClosingIterator(self.app(environ, start_response), self._finished)
+        except BaseException:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.handled += 1
+            limit_reached = self.max_requests and self.handled == self.max_requests
+        if limit_reached:
+            self.on_limit()
+
+
+def run_worker(app, sock, args, on_exit=None):
+    """Serve requests on the shared socket until told to stop, then exit"""
+    stopping = threading.Event()
+    # Spread recycling out so the workers do not all restart at once
+    max_requests = args.max_requests + random.randint(0, args.max_requests // 10) if args.max_requests else 0
+    counter = RequestCounter(app, max_requests, stopping.set)
+    server = make_server(args.host, args.port, counter, threaded=True, fd=sock.fileno())
+
+    if not args.access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the master handles Ctrl+C
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stopping.wait()
+
+    # Stop accepting, then give in-flight requests time to finish
+    server.shutdown()
+    deadline = time.monotonic() + args.graceful_timeout
+    while counter.in_flight and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if on_exit is not None:
+        on_exit()
+    os._exit(0)
+
+
+class Master:
+    """Fork and supervise the worker processes"""
+
+    def __init__(self, app, sock, args, on_exit=None):
+        self.app = app
+        self.on_exit = on_exit
+        self.sock = sock
+        self.args = args
+        self.workers = set()
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.app, self.sock, self.args, self.on_exit)
+            finally:
+                os._exit(1)
+        self.workers.add(pid)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+        print(f"✓ Serving on http://{self.args.host}:{self.args.port} with {self.args.workers} workers (master pid {os.getpid()})")
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            self.workers.discard(pid)
+            if not self.stopping:
+                # Recycled or crashed: replace it
+                if os.waitstatus_to_exitcode(status) != 0:
+                    print(f"⚠ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+                self.spawn()
+        print("✓ All workers stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the House Price Predictor with pre-forked workers')
+    parser.add_argument('--app', default='app', choices=['app', 'standalone'],
+                        help='which Flask app to serve (default app)')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)),
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('MAX_REQUESTS', 0)),
+                        help='restart a worker after about this many requests (default 0 = never)')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help='seconds a stopping worker waits for in-flight requests (default 30)')
+    parser.add_argument('--access-log', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    # Load the app and model before forking, so every worker shares them
+    module = importlib.import_module(args.app)
+    # Optional module-level init() loads the model and starts the app's components
+    init = getattr(module, 'init', None)
+    if init is not None:
+        init()
+    app = module.app
+    # Optional module-level shutdown() writes buffered state before a worker exits
+    on_exit = getattr(module, 'shutdown', None)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    if not hasattr(os, 'fork'):
+        print("⚠ fork() is not available, serving from a single process")
+        print(f"✓ Serving on http://{args.host}:{args.port}")
+        make_server(args.host, args.port, app, threaded=True, fd=sock.fileno()).serve_forever()
+        return
+
+    sys.stdout.flush()
+    Master(app, sock, args, on_exit).run()
+
+
+if __name__ == '__main__':
+    main()
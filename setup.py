@@ -1,98 +1,177 @@
 """
 Setup script to create model files for House Price Predictor
 Run this first: python setup.py
+For datasets that do not fit in memory: python setup.py --chunked
+To pick the best of several models by cross-validation: python setup.py --select
 """
+import argparse
+import json
 import pickle
+import numpy as np
 import pandas as pd
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
 import os
 
-print("=" * 50)
-print("House Price Predictor - Setup")
-print("=" * 50)
-
-# Check if data file exists
-if not os.path.exists('houses.csv'):
-    print("\n❌ houses.csv not found!")
-    print("Please make sure houses.csv is in the same folder as this script.")
-    print("\nCreating a demo model with sample data instead...")
-    
-    # Create sample data for demo
-    import numpy as np
-    np.random.seed(42)
-    n_samples = 1000
-    
-    data = {
-        'bedrooms': np.random.randint(1, 6, n_samples),
-        'bathrooms': np.random.uniform(1, 4, n_samples),
-        'sqft_living': np.random.randint(800, 5000, n_samples),
-        'floors': np.random.choice([1, 1.5, 2, 2.5, 3], n_samples),
-        'waterfront': np.random.choice([0, 1], n_samples, p=[0.99, 0.01]),
-        'view': np.random.randint(0, 5, n_samples),
-        'condition': np.random.randint(1, 6, n_samples),
-        'grade': np.random.randint(4, 12, n_samples),
-        'sqft_above': np.random.randint(600, 4000, n_samples),
-        'sqft_basement': np.random.randint(0, 2000, n_samples),
-        'yr_built': np.random.randint(1900, 2024, n_samples),
-        'yr_renovated': np.random.choice([0] + list(range(1950, 2024)), n_samples),
-        'lat': np.random.uniform(47.4, 47.8, n_samples),
-        'long': np.random.uniform(-122.4, -122.0, n_samples),
-        'sqft_living15': np.random.randint(800, 5000, n_samples),
-        'price': np.random.uniform(15, 150, n_samples)  # in $100k
-    }
-    
-    # Adjust price based on key features
-    for i in range(n_samples):
-        data['price'][i] += data['sqft_living'][i] * 0.02  # $200 per sqft
-        data['price'][i] += data['bedrooms'][i] * 5  # $500k per bedroom
-        data['price'][i] += data['waterfront'][i] * 50  # $5M for waterfront
-        data['price'][i] += data['view'][i] * 10  # $1M per view level
-    
-    df = pd.DataFrame(data)
-    print(f"✓ Created sample dataset with {len(df)} records")
-else:
-    df = pd.read_csv('houses.csv')
-    print(f"✓ Loaded houses.csv with {len(df)} records")
-
-# Prepare features and target
-X = df.drop('price', axis=1)
-y = df['price']
-
-print(f"✓ Features: {list(X.columns)}")
-
-# Train model
-print("\nTraining Linear Regression model...")
-model = Pipeline([
-    ('scaler', StandardScaler()),
-    ('regressor', LinearRegression())
-])
-
-model.fit(X, y)
-
-# Evaluate
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-y_pred = model.predict(X_test)
-from sklearn.metrics import r2_score, mean_squared_error
-r2 = r2_score(y_test, y_pred)
-rmse = mean_squared_error(y_test, y_pred, squared=False)
-
-print(f"✓ Model trained!")
-print(f"  R² Score: {r2:.4f}")
-print(f"  RMSE: {rmse:.2f}")
-
-# Save model
-with open('model.pkl', 'wb') as f:
-    pickle.dump(model, f)
-print(f"✓ Saved model.pkl")
-
-# Save feature names
-with open('features.pkl', 'wb') as f:
-    pickle.dump(list(X.columns), f)
-print(f"✓ Saved features.pkl")
-
-print("\n" + "=" * 50)
-print("Setup complete! You can now run: python app.py")
-print("=" * 50)
+from comparables import ComparablesIndex, build_from_csv
+from datagen import generate_houses
+from training import fit_streaming, is_test_row
+
+
+def select_model(X_train, y_train, args):
+    """Cross-validate the candidate grid and return (name, model fitted on all training rows)"""
+    from selection import CANDIDATE_GRID, build_model, cross_validate, expand_grid, select_best
+
+    grid = CANDIDATE_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    candidates = expand_grid(grid)
+    print(f"\nCross-validating {len(candidates)} candidate models with {args.folds} folds...")
+    results = cross_validate(X_train, y_train, candidates, args.folds, args.workers)
+
+    max_latency = args.max_latency_us * 1e-6 if args.max_latency_us else None
+    try:
+        best = select_best(results, max_latency)
+    except ValueError as e:
+        best = None
+        error = e
+    width = max(len(r['name']) for r in results)
+    print(f"\n  {'Model':<{width}} {'R²':>7} {'RMSE':>8} {'Fit s':>8} {'1 house':>10} {'Per house':>10}")
+    for r in results:
+        marker = '→' if r is best else ' '
+        print(f"{marker} {r['name']:<{width}} {r['r2']:7.4f} {r['rmse']:8.2f} {r['fit_seconds']:8.3f} "
+              f"{r['latency_seconds'] * 1e6:8.1f}us {r['seconds_per_house'] * 1e6:8.2f}us")
+    if best is None:
+        raise SystemExit(f"❌ {error}")
+    print(f"✓ Selected {best['name']}")
+
+    model = build_model(best['family'], best['params'])
+    model.fit(X_train, y_train)
+    return best['name'], model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the House Price Predictor model')
+    parser.add_argument('--data', default='houses.csv', help='training CSV (default houses.csv)')
+    parser.add_argument('--chunked', action='store_true',
+                        help='stream the CSV in chunks instead of loading it into memory')
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help='rows per chunk in --chunked mode (default 100000)')
+    parser.add_argument('--select', action='store_true',
+                        help='cross-validate a grid of candidate models and save the best one')
+    parser.add_argument('--grid', help='JSON file of {family: {param: [values]}} to search instead of the default grid')
+    parser.add_argument('--folds', type=int, default=5, help='cross-validation folds in --select mode (default 5)')
+    parser.add_argument('--workers', type=int, help='processes for --select (default: one per core)')
+    parser.add_argument('--max-latency-us', type=float,
+                        help='in --select mode, only consider models that price one house within this many microseconds')
+    args = parser.parse_args()
+    if args.select and args.chunked:
+        parser.error('--select needs the data in memory and cannot be combined with --chunked')
+
+    print("=" * 50)
+    print("House Price Predictor - Setup")
+    print("=" * 50)
+
+    # Check if data file exists
+    if not os.path.exists(args.data):
+        print(f"\n❌ {args.data} not found!")
+        print("Please make sure houses.csv is in the same folder as this script.")
+        print("\nCreating a demo model with sample data instead...")
+
+        # Create sample data for demo
+        data = generate_houses(1000, seed=42)
+
+        df = pd.DataFrame(data)
+        print(f"✓ Created sample dataset with {len(df)} records")
+    elif not args.chunked:
+        df = pd.read_csv(args.data)
+        print(f"✓ Loaded {args.data} with {len(df)} records")
+
+    if args.chunked and os.path.exists(args.data):
+        # Stream the CSV once, accumulating exact least-squares statistics
+        print(f"\nTraining Linear Regression model on {args.data} in chunks of {args.chunk_size:,} rows...")
+        model, feature_names, n_train, n_test, r2, rmse = fit_streaming(args.data, args.chunk_size)
+        print(f"✓ Features: {feature_names}")
+    else:
+        # Prepare features and target
+        X = df.drop('price', axis=1)
+        y = df['price']
+        feature_names = list(X.columns)
+
+        print(f"✓ Features: {feature_names}")
+
+        # Hold out the same rows the chunked mode would
+        test_mask = is_test_row(np.arange(len(df)))
+        X_train, X_test = X[~test_mask], X[test_mask]
+        y_train, y_test = y[~test_mask], y[test_mask]
+        n_train, n_test = len(X_train), len(X_test)
+
+        if args.select:
+            # Cross-validated on the training rows only, so the held-out score stays honest
+            name, model = select_model(X_train.to_numpy(), y_train.to_numpy(), args)
+            X_test = X_test.to_numpy()
+            print(f"\nTrained {name} on all training rows")
+        else:
+            # Train model
+            print("\nTraining Linear Regression model...")
+            model = Pipeline([
+                ('scaler', StandardScaler()),
+                ('regressor', LinearRegression())
+            ])
+
+            model.fit(X_train, y_train)
+
+        # Evaluate on the held-out rows only
+        y_pred = model.predict(X_test)
+        from sklearn.metrics import r2_score, mean_squared_error
+        r2 = r2_score(y_test, y_pred)
+        rmse = mean_squared_error(y_test, y_pred, squared=False)
+
+    print(f"✓ Model trained on {n_train:,} rows!")
+    print(f"  Held-out rows: {n_test:,}")
+    print(f"  R² Score: {r2:.4f}")
+    print(f"  RMSE: {rmse:.2f}")
+
+    # Save model
+    with open('model.pkl', 'wb') as f:
+        pickle.dump(model, f)
+    print(f"✓ Saved model.pkl")
+
+    # Save feature names
+    with open('features.pkl', 'wb') as f:
+        pickle.dump(feature_names, f)
+    print(f"✓ Saved features.pkl")
+
+    # Save the memory-mappable artifact the servers load without sklearn
+    from artifact import save_model_artifact
+    from inference import CompiledPredictor
+    try:
+        compiled = CompiledPredictor.from_pipeline(model)
+    except ValueError:
+        compiled = None
+    if compiled is not None:
+        save_model_artifact('model.bin', compiled, feature_names)
+        print(f"✓ Saved model.bin")
+    else:
+        # Only linear models have an artifact; a stale one must not shadow model.pkl
+        if os.path.exists('model.bin'):
+            os.remove('model.bin')
+        print(f"⚠ No model.bin for this model: the servers load model.pkl")
+
+    # Save the spatial index of every house in the data for /comparables
+    if args.chunked and os.path.exists(args.data):
+        comparables = build_from_csv(args.data, args.chunk_size)
+    else:
+        comparables = ComparablesIndex.build(df)
+    comparables.save('comparables.bin')
+    print(f"✓ Saved comparables.bin ({len(comparables):,} houses)")
+
+    print("\n" + "=" * 50)
+    print("Setup complete! You can now run: python app.py")
+    print("=" * 50)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,44 @@
 """
 House Price Predictor - Standalone Version
-This single file contains everything needed to run the app!
+Serves the page and API from this file, with the HTML template inline and no
+templates folder. It trains a demo model on first start if none exists.
 Just run: python standalone.py
+
+It needs the project's helper modules next to it: artifact.py, datagen.py,
+inference.py, metrics.py, precomputed.py and registry.py.
 """
 
 # ============================================================
 # PART 1: Create Model (runs automatically on first start)
 # ============================================================
+import time
+_started = time.perf_counter()
+
 import os
 import pickle
 import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
+
+from artifact import save_model_artifact
+from datagen import generate_houses
+from inference import CompiledPredictor
+from metrics import StartupTimer
+from registry import ModelRegistry
 
 MODEL_FILE = 'model.pkl'
 FEATURES_FILE = 'features.pkl'
+ARTIFACT_FILE = 'model.bin'
 
 def create_model():
     """Create a demo model if no data file exists"""
-    print("Creating model...")
-    
-    np.random.seed(42)
-    n_samples = 1000
+    # Training-only dependencies, kept off the serving startup path
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.pipeline import Pipeline
     
-    data = {
-        'bedrooms': np.random.randint(1, 6, n_samples),
-        'bathrooms': np.random.uniform(1, 4, n_samples),
-        'sqft_living': np.random.randint(800, 5000, n_samples),
-        'floors': np.random.choice([1, 1.5, 2, 2.5, 3], n_samples),
-        'waterfront': np.random.choice([0, 1], n_samples, p=[0.99, 0.01]),
-        'view': np.random.randint(0, 5, n_samples),
-        'condition': np.random.randint(1, 6, n_samples),
-        'grade': np.random.randint(4, 12, n_samples),
-        'sqft_above': np.random.randint(600, 4000, n_samples),
-        'sqft_basement': np.random.randint(0, 2000, n_samples),
-        'yr_built': np.random.randint(1900, 2024, n_samples),
-        'yr_renovated': np.random.choice([0] + list(range(1950, 2024)), n_samples),
-        'lat': np.random.uniform(47.4, 47.8, n_samples),
-        'long': np.random.uniform(-122.4, -122.0, n_samples),
-        'sqft_living15': np.random.randint(800, 5000, n_samples),
-        'price': np.random.uniform(15, 150, n_samples)
-    }
+    print("Creating model...")
     
-    # Adjust price based on key features
-    for i in range(n_samples):
-        data['price'][i] += data['sqft_living'][i] * 0.02
-        data['price'][i] += data['bedrooms'][i] * 5
-        data['price'][i] += data['waterfront'][i] * 50
-        data['price'][i] += data['view'][i] * 10
+    data = generate_houses(1000, seed=42)
     
     df = pd.DataFrame(data)
     
@@ -68,19 +57,22 @@ def create_model():
     with open(FEATURES_FILE, 'wb') as f:
         pickle.dump(list(X.columns), f)
     
+    save_model_artifact(ARTIFACT_FILE, CompiledPredictor.from_pipeline(model), list(X.columns))
+    
     print("Model created successfully!")
     return model, list(X.columns)
 
 def load_model():
-    """Load or create the model"""
+    """Load or create the model, returning a ModelRegistry that hot-reloads retrains"""
     if not os.path.exists(MODEL_FILE) or not os.path.exists(FEATURES_FILE):
-        return create_model()
+        create_model()
     
-    with open(MODEL_FILE, 'rb') as f:
-        model = pickle.load(f)
-    with open(FEATURES_FILE, 'rb') as f:
-        features = pickle.load(f)
-    return model, features
+    models = ModelRegistry(ARTIFACT_FILE, MODEL_FILE, FEATURES_FILE)
+    # New versions must price a batch of demo houses before they serve
+    data = generate_houses(256, seed=0)
+    models.smoke_batch = np.column_stack([data[f] for f in models.active.feature_names])
+    models.start()
+    return models
 
 # ============================================================
 # PART 2: HTML Template (embedded)
@@ -284,30 +276,28 @@ HTML_TEMPLATE = '''
         </div>
     </div>
     <script>
-        const featureImportance = [
-            { name: 'Living Area (sqft)', importance: 0.429 },
-            { name: 'Latitude', importance: 0.163 },
-            { name: 'Living Area 2015', importance: 0.139 },
-            { name: 'Waterfront', importance: 0.062 },
-            { name: 'View Quality', importance: 0.042 },
-            { name: 'Longitude', importance: 0.040 },
-            { name: 'Year Built', importance: 0.029 },
-            { name: 'Above Ground (sqft)', importance: 0.025 },
-            { name: 'Grade', importance: 0.020 },
-            { name: 'Basement (sqft)', importance: 0.014 },
-            { name: 'Year Renovated', importance: 0.010 },
-            { name: 'Floors', importance: 0.008 },
-            { name: 'Bathrooms', importance: 0.008 },
-            { name: 'Condition', importance: 0.008 },
-            { name: 'Bedrooms', importance: 0.004 }
-        ];
-        document.getElementById('featureImportance').innerHTML = featureImportance.map(f => `
-            <div class="feature-item">
-                <span class="feature-name">${f.name}</span>
-                <div class="feature-bar"><div class="feature-fill" style="width: ${f.importance * 200}%"></div></div>
-                <span class="feature-value">${(f.importance * 100).toFixed(1)}%</span>
-            </div>
-        `).join('');
+        const featureLabels = {
+            bedrooms: 'Bedrooms', bathrooms: 'Bathrooms', sqft_living: 'Living Area (sqft)',
+            floors: 'Floors', waterfront: 'Waterfront', view: 'View Quality', condition: 'Condition',
+            grade: 'Grade', sqft_above: 'Above Ground (sqft)', sqft_basement: 'Basement (sqft)',
+            yr_built: 'Year Built', yr_renovated: 'Year Renovated', lat: 'Latitude', long: 'Longitude',
+            sqft_living15: 'Living Area 2015'
+        };
+        fetch('/importance').then(async res => {
+            const result = await res.json();
+            if (!res.ok) throw new Error(result.error);
+            document.getElementById('featureImportance').innerHTML = result.importances.map(f => `
+                <div class="feature-item">
+                    <span class="feature-name">${featureLabels[f.feature] || f.feature}</span>
+                    <div class="feature-bar"><div class="feature-fill" style="width: ${f.importance * 200}%"></div></div>
+                    <span class="feature-value">${(f.importance * 100).toFixed(1)}%</span>
+                </div>
+            `).join('');
+        }).catch(() => {
+            // Tree models picked by setup.py --select have no importances (501)
+            document.getElementById('featureImportance').innerHTML =
+                '<p style="color: #666;">Feature importance is not available for this model.</p>';
+        });
         document.getElementById('predictionForm').addEventListener('submit', async (e) => {
             e.preventDefault();
             const formData = new FormData(e.target);
@@ -336,13 +326,33 @@ HTML_TEMPLATE = '''
 # PART 3: Flask App
 # ============================================================
 from flask import Flask, request, jsonify, render_template_string
+from inference import format_prediction, predict_records
+from precomputed import PrecomputedResponse
+
+startup = StartupTimer(_started)
+startup.mark('imports')
 
 app = Flask(__name__)
-model, feature_names = load_model()
+models = load_model()
+feature_names = models.active.feature_names
+
+startup.mark('model load')
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 10000))
+
+# The page never changes, so render and compress it once
+with app.app_context():
+    home_response = PrecomputedResponse(render_template_string(HTML_TEMPLATE), 'text/html')
+
+@app.before_request
+def check_model_pin():
+    """Refuse a request pinned to a model version that is not resident, instead of serving another"""
+    requested = request.headers.get('X-Model-Version')
+    if requested and models.get(requested) is None:
+        return jsonify({'error': f'Model version {requested} is not loaded'}), 409
 
 @app.route('/')
 def home():
-    return render_template_string(HTML_TEMPLATE)
+    return home_response.respond(request)
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -350,14 +360,48 @@ def predict():
         data = request.get_json()
         features = [float(data[f]) for f in feature_names]
         features_array = np.array(features).reshape(1, -1)
-        prediction = model.predict(features_array)[0]
+        model = models.choose(request.headers.get('X-Model-Version'))
+        prediction = model.predictor.predict(features_array)[0]
+        result = format_prediction(prediction)
+        result['model_version'] = model.version
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    try:
+        records = request.get_json()
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a JSON array of houses'}), 400
+        if len(records) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch too large: {len(records)} houses (max {MAX_BATCH_SIZE})'}), 413
+        model = models.choose(request.headers.get('X-Model-Version'))
+        results = predict_records(model.predictor, records, feature_names)
         return jsonify({
-            'predicted_price': round(prediction, 2),
-            'predicted_price_formatted': f'${prediction * 100000:,.0f}'
+            'predictions': results,
+            'count': len(results),
+            'errors': sum('error' in r for r in results),
+            'model_version': model.version
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/importance', methods=['GET'])
+def importance():
+    model = models.active
+    if not hasattr(model.predictor, 'importances'):
+        return jsonify({'error': 'The serving model does not support explanations'}), 501
+    importances = sorted(zip(feature_names, model.predictor.importances.tolist()), key=lambda x: -x[1])
+    return jsonify({
+        'importances': [{'feature': f, 'importance': round(v, 4)} for f, v in importances],
+        'model_version': model.version
+    })
+
+startup.mark('app init')
+if os.environ.get('STARTUP_TIMING'):
+    startup.report()
+
 # ============================================================
 # PART 4: Run the App
 # ============================================================
@@ -0,0 +1,144 @@
+"""
+Parity checks for the fast paths against the code they replace, on the demo
+houses that setup.py trains on when no houses.csv is given
+"""
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import payloads
+from artifact import load_model_artifact, save_model_artifact
+from comparables import KM_PER_DEGREE_LAT, KM_PER_DEGREE_LONG, ComparablesIndex
+from datagen import DEMO_ROWS, generate_houses
+from inference import CompiledPredictor, Float32Predictor, load_float32_predictor
+from training import fit_streaming, is_test_row
+
+
+@pytest.fixture(scope='module')
+def houses():
+    return pd.DataFrame(generate_houses(DEMO_ROWS, seed=42))
+
+
+@pytest.fixture(scope='module')
+def features(houses):
+    return houses.drop('price', axis=1)
+
+
+@pytest.fixture(scope='module')
+def pipeline(houses, features):
+    """The model setup.py trains in memory"""
+    test_mask = is_test_row(np.arange(len(houses)))
+    model = Pipeline([('scaler', StandardScaler()), ('regressor', LinearRegression())])
+    return model.fit(features[~test_mask], houses['price'][~test_mask])
+
+
+def test_compiled_predictor_matches_sklearn(pipeline, features, tmp_path):
+    X = features.to_numpy(dtype=np.float64)
+    expected = pipeline.predict(features)
+    compiled = CompiledPredictor.from_pipeline(pipeline)
+    np.testing.assert_allclose(compiled.predict(X), expected, rtol=0, atol=1e-9)
+
+    # The same weights survive model.bin
+    save_model_artifact(str(tmp_path / 'model.bin'), compiled, list(features.columns))
+    loaded, feature_names = load_model_artifact(str(tmp_path / 'model.bin'))
+    assert feature_names == list(features.columns)
+    np.testing.assert_allclose(loaded.predict(X), expected, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('chunk_size', [97, DEMO_ROWS])
+def test_chunked_fit_matches_in_memory_fit(houses, features, pipeline, tmp_path, chunk_size):
+    path = tmp_path / 'houses.csv'
+    houses.to_csv(path, index=False)
+    model, feature_names, n_train, n_test, r2, rmse = fit_streaming(str(path), chunk_size)
+
+    test_mask = is_test_row(np.arange(len(houses)))
+    assert feature_names == list(features.columns)
+    assert (n_train, n_test) == ((~test_mask).sum(), test_mask.sum())
+    np.testing.assert_allclose(model.predict(features), pipeline.predict(features), rtol=0, atol=1e-6)
+    assert r2 == pytest.approx(pipeline.score(features[test_mask], houses['price'][test_mask]), abs=1e-9)
+
+
+def test_float32_predictor_within_tolerance(pipeline, features):
+    compiled = CompiledPredictor.from_pipeline(pipeline)
+    X = features.to_numpy(dtype=np.float64)
+    predictor = load_float32_predictor(compiled, tolerance_dollars=100, capacity=64)
+    assert isinstance(predictor, Float32Predictor)
+
+    # Parsed straight into the reusable buffer, larger than its first capacity
+    batch = predictor.buffer(len(X))
+    batch[...] = X
+    prices = predictor.predict(batch).astype(np.float64)
+    deviation = np.max(np.abs(prices - compiled.predict(X))) * 100000
+    assert deviation <= 100
+
+    # Any other matrix is scored without being overwritten
+    copy = X.astype(np.float32)
+    np.testing.assert_array_equal(predictor.predict(copy), prices)
+    np.testing.assert_array_equal(copy, X.astype(np.float32))
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_matrix_payload_round_trip(features, dtype):
+    names = list(features.columns)
+    shuffled = names[::-1]
+    body = payloads.encode_matrix(features[shuffled].to_numpy(), shuffled, dtype)
+    matrix, answer_dtype = payloads.decode(payloads.MATRIX_TYPE, body, names)
+    assert answer_dtype == dtype
+    np.testing.assert_array_equal(matrix, features[names].to_numpy().astype(dtype))
+
+    prices = np.linspace(1, 50, 7)
+    decoded, columns = payloads.decode_matrix(payloads.encode(payloads.MATRIX_TYPE, prices, dtype))
+    assert columns == ['predicted_price']
+    np.testing.assert_array_equal(decoded[:, 0], prices.astype(dtype))
+
+
+def test_columnar_payload_round_trip(features):
+    names = list(features.columns)
+    body = json.dumps({name: features[name].tolist() for name in reversed(names)}).encode()
+    matrix, _ = payloads.decode(payloads.COLUMNAR_TYPE, body, names)
+    np.testing.assert_array_equal(matrix, features[names].to_numpy(dtype=np.float64))
+
+
+def test_payload_rejects_non_finite_values(features):
+    names = list(features.columns)
+    values = features[names].to_numpy(dtype=np.float64)
+    values[3, 2] = np.nan
+    with pytest.raises(payloads.PayloadError, match='Row 3'):
+        payloads.decode(payloads.MATRIX_TYPE, payloads.encode_matrix(values, names), names)
+
+
+def brute_force_nearest(houses, lat, long, k, radius_km, filters=None):
+    """Distances to the k nearest houses, computed over every row"""
+    dy = (houses['lat'].to_numpy() - lat) * KM_PER_DEGREE_LAT
+    dx = (houses['long'].to_numpy() - long) * (KM_PER_DEGREE_LONG * math.cos(math.radians(lat)))
+    distance = np.hypot(dx, dy)
+    mask = distance <= radius_km
+    for name, (low, high) in (filters or {}).items():
+        column = houses[name].to_numpy(dtype=np.float32)
+        mask &= (column >= low) & (column <= high)
+    return np.sort(distance[mask])[:k]
+
+
+@pytest.mark.parametrize('lat, long, k, radius_km, filters', [
+    (47.6, -122.2, 10, 2.0, None),
+    (47.45, -122.35, 25, 5.0, None),
+    (47.6, -122.2, 10, 10.0, {'bedrooms': (3, 3), 'sqft_living': (1500, 2500)}),
+    (47.8, -122.0, 5, 1.0, None),
+    (48.5, -121.0, 5, 1.0, None),
+])
+def test_comparables_match_brute_force(houses, lat, long, k, radius_km, filters):
+    index = ComparablesIndex.build(houses)
+    results = index.query(lat, long, k, radius_km, filters)
+    expected = brute_force_nearest(houses, lat, long, k, radius_km, filters)
+    np.testing.assert_allclose([distance for _, distance in results], expected, rtol=0, atol=1e-9)
+
+    # Positions map back to the same houses in the training rows
+    for position, _ in results:
+        row = houses.iloc[index.rows[position]]
+        assert (row['lat'], row['long']) == (index.lat[position], index.long[position])
@@ -0,0 +1,142 @@
+"""
+Training helpers for House Price Predictor
+Used by setup.py for both in-memory and out-of-core (chunked) training.
+"""
+import numpy as np
+
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
+
+def is_test_row(row_index, test_size=TEST_SIZE, seed=SPLIT_SEED):
+    """Return a boolean mask assigning rows to the held-out set
+
+    The assignment depends only on the row number, so the in-memory and
+    chunked training paths hold out exactly the same rows whatever the
+    chunk size.
+    """
+    # splitmix64 hash of the row number, mapped to [0, 1)
+    x = np.asarray(row_index, dtype=np.uint64) + np.uint64(seed)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) * 2.0 ** -53 < test_size
+
+
+class RunningMoments:
+    """Streaming column means and co-moment matrix of a 2-D array
+
+    Chunks are merged with the pairwise update of Chan et al., which stays
+    accurate on large, uncentered values such as years and square footage.
+    """
+
+    def __init__(self, n_columns):
+        self.n = 0
+        self.mean = np.zeros(n_columns)
+        self.comoment = np.zeros((n_columns, n_columns))
+
+    def update(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        n_b = len(chunk)
+        if n_b == 0:
+            return
+        mean_b = chunk.mean(axis=0)
+        centered = chunk - mean_b
+        comoment_b = centered.T @ centered
+
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.comoment += comoment_b + np.outer(delta, delta) * (self.n * n_b / n)
+        self.mean += delta * (n_b / n)
+        self.n = n
+
+
+def solve_least_squares(moments):
+    """Solve the standardized least-squares problem from training moments
+
+    `moments` covers the feature columns followed by the target column.
+    Returns (scaler mean, scaler variance, scaler scale, coef, intercept) with
+    coef expressed on the standardized features, as in the sklearn Pipeline.
+    """
+    d = len(moments.mean) - 1
+    mean = moments.mean[:d].copy()
+    var = np.diag(moments.comoment)[:d] / moments.n
+    scale = np.sqrt(var)
+    # Constant columns are left unscaled, as StandardScaler does
+    scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+
+    czz = moments.comoment[:d, :d] / np.outer(scale, scale)
+    czy = moments.comoment[:d, d] / scale
+    coef = np.linalg.lstsq(czz, czy, rcond=None)[0]
+    intercept = float(moments.mean[d])
+    return mean, var, scale, coef, intercept
+
+
+def held_out_scores(moments, mean, scale, coef, intercept):
+    """Return (R², RMSE) of a linear model on the rows summarised by `moments`
+
+    The residual sum of squares is a quadratic form in the moments, so the
+    held-out set never has to be kept in memory.
+    """
+    if moments.n == 0:
+        return float('nan'), float('nan')
+    d = len(mean)
+    beta = coef / scale
+    bias = intercept - mean @ beta
+    v = np.append(-beta, 1.0)
+    mean_residual = moments.mean[d] - moments.mean[:d] @ beta - bias
+    sse = v @ moments.comoment @ v + moments.n * mean_residual ** 2
+    sst = moments.comoment[d, d]
+    return 1 - sse / sst, float(np.sqrt(sse / moments.n))
+
+
+def build_pipeline(feature_names, n_samples, mean, var, scale, coef, intercept):
+    """Return a fitted Pipeline(StandardScaler, LinearRegression) from solved parameters"""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    scaler.mean_ = mean
+    scaler.var_ = var
+    scaler.scale_ = scale
+    scaler.n_samples_seen_ = n_samples
+    scaler.n_features_in_ = len(feature_names)
+    scaler.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    regressor = LinearRegression()
+    regressor.coef_ = coef
+    regressor.intercept_ = intercept
+    regressor.n_features_in_ = len(feature_names)
+
+    return Pipeline([
+        ('scaler', scaler),
+        ('regressor', regressor)
+    ])
+
+
+def fit_streaming(path, chunk_size, target='price'):
+    """Fit the scaler + linear model on a CSV without loading it into memory
+
+    Rows are split into train and held-out sets with is_test_row() as they
+    stream past. Returns (pipeline, feature_names, n_train, n_test, r2, rmse).
+    """
+    import pandas as pd
+
+    train = test = feature_names = None
+    row = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        if feature_names is None:
+            feature_names = [c for c in chunk.columns if c != target]
+            train = RunningMoments(len(feature_names) + 1)
+            test = RunningMoments(len(feature_names) + 1)
+        values = chunk[feature_names + [target]].to_numpy(dtype=np.float64)
+        mask = is_test_row(np.arange(row, row + len(values)))
+        train.update(values[~mask])
+        test.update(values[mask])
+        row += len(values)
+
+    mean, var, scale, coef, intercept = solve_least_squares(train)
+    r2, rmse = held_out_scores(test, mean, scale, coef, intercept)
+    pipeline = build_pipeline(feature_names, train.n, mean, var, scale, coef, intercept)
+    return pipeline, feature_names, train.n, test.n, r2, rmse